@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmarks and graph statistics for the 6.009 Lab 2 actor graph.
+
+Run from the directory containing resources/ (the same place lab2 expects to
+find names.json and movies.json):
+
+    python3 lab2_benchmark.py tiny small large --queries 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import lab2_solution as lab
+
+
+def load_dataset(resources, name):
+    """
+    Load resources/<name>.json, a list of [actor, actor, movie] triples.
+    """
+    with open(os.path.join(resources, name + '.json')) as f:
+        return json.load(f)
+
+
+def time_call(f, *args, repeat=1):
+    """
+    Call f(*args) repeat times.  Returns a tuple containing the best time in
+    seconds and the result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def degree_distribution(acted_with):
+    """
+    Returns a dictionary mapping each degree (number of co-stars) to the number
+    of actors with that degree.
+    """
+    out = {}
+    for neighbors in acted_with.values():
+        out[len(neighbors)] = out.get(len(neighbors), 0) + 1
+    return out
+
+
+def component_sizes(acted_with):
+    """
+    Returns the sizes of the connected components of the graph, largest first.
+    """
+    seen = {}
+    sizes = []
+    for actor in acted_with:
+        if actor in seen:
+            continue
+        seen[actor] = None
+        cur_level = {actor}
+        size = 1
+        while cur_level:
+            cur_level = lab.expand(acted_with, cur_level, seen)
+            size += len(cur_level)
+        sizes.append(size)
+    return sorted(sizes, reverse=True)
+
+
+def time_queries(f, db, pairs):
+    """
+    Run f(db, a, b) for each pair.  Returns (seconds, queries per second).
+    """
+    start = time.perf_counter()
+    for a, b in pairs:
+        f(db, a, b)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(pairs) / elapsed if elapsed else float('inf')
+
+
+def benchmark(data, queries=20, seed=0, repeat=3):
+    """
+    Time the main graph operations on the given database, and compute some
+    statistics about its graph.  Returns a dictionary of results.
+    """
+    rng = random.Random(seed)
+    results = {'edges': len(data)}
+
+    results['neighbor_db_s'], acted_with = time_call(lab.make_neighbor_db, data, repeat=repeat)
+    results['actors'] = len(acted_with)
+
+    actors = sorted(acted_with)
+    root = lab.BACON if lab.BACON in acted_with else actors[0]
+    results['bfs_s'], distances = time_call(lab.make_bacon_distances, acted_with, root, repeat=repeat)
+    results['bfs_reached'] = len(distances)
+
+    degrees = degree_distribution(acted_with)
+    results['degree_distribution'] = dict(sorted(degrees.items()))
+    results['max_degree'] = max(degrees)
+    results['mean_degree'] = sum(d * n for d, n in degrees.items()) / len(acted_with)
+    sizes = component_sizes(acted_with)
+    results['components'] = len(sizes)
+    results['largest_components'] = sizes[:10]
+
+    # both searches run against the neighbor db built (and timed) above, so
+    # that the times compare the searches alone.
+    pairs = [(rng.choice(actors), rng.choice(actors)) for _ in range(queries)]
+    results['path_s'], results['path_qps'] = time_queries(lab.find_path, acted_with, pairs)
+    results['bidirectional_s'], results['bidirectional_qps'] = time_queries(
+        lab.find_path_bidirectional, acted_with, pairs)
+
+    # get_movie_path works with names, and needs a path to exist.
+    try:
+        id_to_name = {v: k for k, v in lab.get_actor_name_map().items()}
+        lab.get_movie_name_map()
+    except FileNotFoundError:
+        return results
+    named = [(a, b) for a, b in pairs
+             if a in id_to_name and b in id_to_name and b in distances and a in distances]
+    named = [(id_to_name[a], id_to_name[b]) for a, b in named]
+    if named:
+        results['movie_path_s'], results['movie_path_qps'] = time_queries(
+            lab.get_movie_path, data, named)
+    return results
+
+
+def report(name, results):
+    """
+    Print a human-readable summary of the results from benchmark.
+    """
+    print('== %s: %d actors, %d edges' % (name, results['actors'], results['edges']))
+    print('  make_neighbor_db:     %.4fs' % results['neighbor_db_s'])
+    print('  single BFS:           %.4fs (%d actors reached)' % (results['bfs_s'], results['bfs_reached']))
+    print('  find_path:            %.4fs (%.1f queries/s)' % (results['path_s'], results['path_qps']))
+    print('  bidirectional path:   %.4fs (%.1f queries/s)' % (results['bidirectional_s'], results['bidirectional_qps']))
+    if 'movie_path_s' in results:
+        print('  get_movie_path:       %.4fs (%.1f queries/s)' % (results['movie_path_s'], results['movie_path_qps']))
+    print('  degree: max %d, mean %.2f' % (results['max_degree'], results['mean_degree']))
+    print('  components: %d, largest %s' % (results['components'], results['largest_components']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('datasets', nargs='*', default=['tiny', 'small', 'large'])
+    parser.add_argument('--resources', default='resources')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON instead of a summary')
+    args = parser.parse_args(argv)
+
+    all_results = {}
+    for name in args.datasets:
+        data = load_dataset(args.resources, name)
+        all_results[name] = benchmark(data, args.queries, args.seed, args.repeat)
+        if not args.json:
+            report(name, all_results[name])
+    if args.json:
+        json.dump(all_results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
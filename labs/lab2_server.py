@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP query service for the 6.009 Lab 2 actor graph.
+
+The database is loaded once, when the server starts.  As with the tutorials'
+RPCServerHandler, queries are POST requests whose path names the function to
+call, with JSON arguments and a JSON response:
+
+    POST /path          {"actor_1": 4724, "actor_2": 1640}
+    POST /bacon_number  {"actor": 1640}
+    POST /movie_path    {"actor_1": "Kevin Bacon", "actor_2": "Julia Roberts"}
+
+Requests are handled concurrently on an asyncio event loop.  Bacon numbers are
+read from a table computed at startup; path searches run in a pool of worker
+processes (each holding its own copy of the graph), so that one slow search
+does not hold up the event loop or other queries.
+
+    python3 lab2_server.py resources/large.json --resources resources
+"""
+
+import os
+import json
+import asyncio
+import argparse
+import traceback
+import concurrent.futures
+
+import lab2_solution as lab
+
+
+# the loaded graph, in this process.  filled in by load_graph, in the main
+# process and in each worker.
+graph = {}
+
+
+def load_graph(database, resources=None):
+    """
+    Load the given database file, and build the structures that queries need.
+    If a resources directory is given, also load the actor and movie name
+    maps from it (needed for movie_path).
+    """
+    with open(database) as f:
+        data = json.load(f)
+    graph.clear()
+    graph['acted_with'] = lab.make_neighbor_db(data)
+    graph['movie_db'] = lab.get_actors_to_movie_db(data)
+    if resources is not None:
+        with open(os.path.join(resources, 'names.json')) as f:
+            graph['actor_ids'] = json.load(f)
+        with open(os.path.join(resources, 'movies.json')) as f:
+            graph['movie_names'] = {v: k for k, v in json.load(f).items()}
+
+
+def init_worker(database, resources):
+    """
+    Initializer for the worker processes.  Workers that were forked from the
+    main process already share its copy of the graph; others load their own.
+    """
+    if not graph:
+        load_graph(database, resources)
+
+
+def find_path(actor_id_1, actor_id_2):
+    """
+    Worker function: the path of actor IDs connecting the two actors, or None.
+    """
+    return lab.find_path(graph['acted_with'], actor_id_1, actor_id_2)
+
+
+def find_movie_path(actor_id_1, actor_id_2):
+    """
+    Worker function: the list of movie names connecting the two actors, or
+    None if they are not connected.
+    """
+    path = lab.find_path(graph['acted_with'], actor_id_1, actor_id_2)
+    if path is None:
+        return None
+    return [graph['movie_names'][graph['movie_db'][lab.actor_pair_key(a, b)]]
+            for a, b in zip(path, path[1:])]
+
+
+class QueryError(Exception):
+    """
+    A problem with a request, reported to the client with the given HTTP
+    status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ActorGraphServer:
+    """
+    Answers queries about the loaded graph, running searches in the given
+    executor.
+    """
+    def __init__(self, executor, bacon_distances):
+        self.executor = executor
+        self.bacon_distances = bacon_distances
+        self.functions = {'path': self.path,
+                          'bacon_number': self.bacon_number,
+                          'movie_path': self.movie_path}
+
+    def actor_id(self, args, key):
+        if key not in args:
+            raise QueryError(400, 'missing argument: ' + key)
+        if not isinstance(args[key], int) or isinstance(args[key], bool):
+            raise QueryError(400, 'bad actor ID: %r' % (args[key], ))
+        if args[key] not in graph['acted_with']:
+            raise QueryError(404, 'unknown actor: %r' % (args[key], ))
+        return args[key]
+
+    async def offload(self, f, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, f, *args)
+
+    async def path(self, args):
+        return await self.offload(find_path, self.actor_id(args, 'actor_1'),
+                                  self.actor_id(args, 'actor_2'))
+
+    async def bacon_number(self, args):
+        return self.bacon_distances.get(self.actor_id(args, 'actor'))
+
+    async def movie_path(self, args):
+        if 'actor_ids' not in graph:
+            raise QueryError(404, 'movie_path needs the server to be started with --resources')
+        ids = {}
+        for key in ('actor_1', 'actor_2'):
+            if key not in args:
+                raise QueryError(400, 'missing argument: ' + key)
+            if not isinstance(args[key], str):
+                raise QueryError(400, 'bad actor name: %r' % (args[key], ))
+            if args[key] not in graph['actor_ids']:
+                raise QueryError(404, 'unknown actor name: %r' % (args[key], ))
+            ids[key] = self.actor_id({key: graph['actor_ids'][args[key]]}, key)
+        return await self.offload(find_movie_path, ids['actor_1'], ids['actor_2'])
+
+    async def call(self, name, body):
+        if name not in self.functions:
+            raise QueryError(404, 'function not found: %s, while registered functions are: %s'
+                                  % (name, sorted(self.functions)))
+        try:
+            args = json.loads(body.decode())
+        except ValueError:
+            raise QueryError(400, "POST data doesn't look like json")
+        if not isinstance(args, dict):
+            raise QueryError(400, 'arguments must be a JSON object')
+        return await self.functions[name](args)
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests on one connection, until the client closes it (or
+        asks us to).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                name = target.lstrip('/').split('?')[0]
+                try:
+                    if method != 'POST':
+                        raise QueryError(405, 'only POST is supported')
+                    status, result = 200, await self.call(name, body)
+                except QueryError as e:
+                    status, result = e.status, {'error': str(e)}
+                except Exception:
+                    traceback.print_exc()
+                    status, result = 500, {'error': 'internal error'}
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version != 'HTTP/1.0')
+                payload = json.dumps(result).encode()
+                writer.write(('HTTP/1.1 %d %s\r\n'
+                              'Content-Type: application/json; charset=UTF-8\r\n'
+                              'Content-Length: %d\r\n'
+                              'Connection: %s\r\n\r\n'
+                              % (status, 'OK' if status == 200 else 'Error', len(payload),
+                                 'keep-alive' if keep_alive else 'close')).encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away
+        finally:
+            writer.close()
+
+
+async def serve(host, port, executor):
+    acted_with = graph['acted_with']
+    distances = lab.make_bacon_distances(acted_with) if lab.BACON in acted_with else {}
+    server = ActorGraphServer(executor, distances)
+    async with await asyncio.start_server(server.handle, host, port) as s:
+        print('serving on http://%s:%d' % (host, port), flush=True)
+        await s.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('database', help='a JSON list of [actor, actor, movie] triples')
+    parser.add_argument('--resources', default=None,
+                        help='directory containing names.json and movies.json')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    load_graph(args.database, args.resources)
+    with concurrent.futures.ProcessPoolExecutor(
+            args.workers, initializer=init_worker,
+            initargs=(args.database, args.resources)) as executor:
+        try:
+            asyncio.run(serve(args.host, args.port, executor))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
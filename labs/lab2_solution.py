@@ -4,15 +4,34 @@ import json
 
 BACON = 4724
 
-def did_x_and_y_act_together(data, actor_id_1, actor_id_2):
+def did_x_and_y_act_together(data, actor_id_1, actor_id_2, acted_with=None):
     """
     Returns True if the two given actors acted together (according to the given
     database) and False otherwise.
+
+    If acted_with (the output of make_neighbor_db(data), built once by the
+    caller) is given, this is a single set lookup in it rather than a scan of
+    the whole database.  It must be rebuilt if the database changes.
     """
+    if acted_with is not None:
+        return actor_id_2 in acted_with.get(actor_id_1, ())
     these_actors = {actor_id_1, actor_id_2}
     return any({i, j} == these_actors for i, j, _ in data)
 
 
+def did_pairs_act_together(data, pairs, acted_with=None):
+    """
+    Returns a list containing, for each (actor_id_1, actor_id_2) pair in
+    pairs, whether those two actors acted together.  acted_with is as in
+    did_x_and_y_act_together; if it is not given, it is built once for the
+    whole batch.
+    """
+    if acted_with is None:
+        acted_with = make_neighbor_db(data)
+    empty = set()
+    return [b in acted_with.get(a, empty) for a, b in pairs]
+
+
 def make_neighbor_db(data):
     """
     Returns a different mapping that is more conducive to the kinds of
@@ -30,7 +49,30 @@ def make_neighbor_db(data):
     return acted_with
 
 
-def expand(acted_with, current_level, parents):
+def make_neighbor_movie_db(data):
+    """
+    Like make_neighbor_db, but each actor id maps to a dictionary from the
+    people they have acted with to the set of movies they made together.
+    Iterating over an actor's entry gives the same neighbors as in the output
+    of make_neighbor_db, so this mapping can be passed to expand as well.
+    """
+    movies_with = {}
+    for i, j, m in data:
+        movies_with.setdefault(i, {}).setdefault(j, set()).add(m)
+        movies_with.setdefault(j, {}).setdefault(i, set()).add(m)
+    return movies_with
+
+
+def allowed_movies(data, movie_filter):
+    """
+    Returns the set of movie IDs in the given database for which movie_filter
+    (a function of one movie ID, returning a boolean) is true.  The filter is
+    called once per distinct movie, not once per pair of actors.
+    """
+    return {m for m in {m for _, _, m in data} if movie_filter(m)}
+
+
+def expand(acted_with, current_level, parents, allowed=None, all_parents=False):
     """
     Run one "expansion", moving to a larger Bacon number.
 
@@ -40,6 +82,13 @@ def expand(acted_with, current_level, parents):
        current_level: a set containing the IDs at the 'current' Bacon level (N)
        parents: a dictionary mapping actor IDs to their parents (i.e., the actor
                 that led to them while traversing the graph).
+       allowed: if given, a set of movie IDs (from allowed_movies); we only
+                follow an edge between two actors if they made at least one
+                of these movies together.  In this case acted_with must be
+                the output from make_neighbor_movie_db.
+       all_parents: if True, parents maps each actor ID to a list of all of
+                    their parents at the previous level (so that every
+                    shortest path is recorded), rather than to a single one.
 
     Returns:
        The set of people with Bacon number N+1
@@ -53,11 +102,20 @@ def expand(acted_with, current_level, parents):
             # actor we've seen is in the parents dictionary, so we skip any
             # actor that is already in that dictionary.
             if neighbor not in parents:
+                # skip edges that only exist through movies we are not allowed
+                # to use.
+                if allowed is not None and allowed.isdisjoint(acted_with[actor][neighbor]):
+                    continue
                 # this is a new actor.  add them to our set of people at level
                 # N+1, and also add them to the parents dictionary so we don't
                 # double-count them later.
-                parents[neighbor] = actor
+                parents[neighbor] = [actor] if all_parents else actor
                 new_level.add(neighbor)
+            elif all_parents and neighbor in new_level:
+                # we have already reached this actor at level N+1, through
+                # someone else at level N; this is another shortest path.
+                if allowed is None or not allowed.isdisjoint(acted_with[actor][neighbor]):
+                    parents[neighbor].append(actor)
     return new_level
 
 
@@ -79,19 +137,111 @@ def get_actors_with_bacon_number(data, n):
     return cur_level  # spec requires that we return a set.
 
 
-def get_bacon_path(data, actor_id):
+class PathCache:
+    """
+    A least-recently-used cache of shortest paths between pairs of actors, to
+    be passed to get_path (or get_bacon_path/get_movie_path).
+
+    A path from x to y is just the reverse of a path from y to x, so each
+    unordered pair of actors is stored only once.  The cache also remembers
+    which database it was filled from, and empties itself when it is used
+    with a different database or when that database has grown; call
+    invalidate explicitly after changing the edges in some other way.
+
+    The hits and misses attributes count the lookups made so far.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.paths = {}
+        self.data = None
+        self.data_size = None
+
+    def invalidate(self):
+        """
+        Forget every stored path (the hit and miss counts are kept).
+        """
+        self.paths.clear()
+
+    def check_data(self, data):
+        """
+        Invalidate the cache if data is not the database (of the same size)
+        that the stored paths were computed from.
+        """
+        if data is not self.data or len(data) != self.data_size:
+            self.invalidate()
+            self.data = data
+            self.data_size = len(data)
+
+    def get(self, data, actor_id_1, actor_id_2):
+        """
+        Look up the path from actor_id_1 to actor_id_2.  Returns a tuple
+        (found, path); path may be None if we stored the fact that there is
+        no path between the two actors.
+        """
+        self.check_data(data)
+        key = actor_pair_key(actor_id_1, actor_id_2)
+        if key not in self.paths:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        # dictionaries remember insertion order, so re-inserting the key moves
+        # it to the "most recently used" end.
+        path = self.paths.pop(key)
+        self.paths[key] = path
+        if path is None:
+            return True, None
+        # hand out a copy, so that callers can't modify our stored path.
+        return True, path[:] if path[0] == actor_id_1 else path[::-1]
+
+    def put(self, data, actor_id_1, actor_id_2, path):
+        """
+        Store the path (or None) from actor_id_1 to actor_id_2, evicting the
+        least recently used path if the cache is full.
+        """
+        self.check_data(data)
+        key = actor_pair_key(actor_id_1, actor_id_2)
+        self.paths.pop(key, None)
+        self.paths[key] = None if path is None else path[:]
+        while len(self.paths) > self.maxsize:
+            # the first key in the dictionary is the least recently used one.
+            del self.paths[next(iter(self.paths))]
+
+
+def get_bacon_path(data, actor_id, cache=None, movie_filter=None):
     """
     Returns the path of actor ids from BACON to the given actor ID.  Uses
     get_path.
     """
-    return get_path(data, BACON, actor_id)
+    return get_path(data, BACON, actor_id, cache, movie_filter)
 
 
-def get_path(data, actor_id_1, actor_id_2):
+def get_path(data, actor_id_1, actor_id_2, cache=None, movie_filter=None):
     """
-    Return the path of actor IDs connecting actor_id_1 to actor_id_2
+    Return the path of actor IDs connecting actor_id_1 to actor_id_2.  If a
+    PathCache is given, it is consulted first and updated with the result.
+
+    If movie_filter (a function of one movie ID, returning a boolean) is
+    given, the path only goes through movies for which it returns True.
+    Filtered searches do not use the cache.
+    """
+    if cache is not None and movie_filter is None:
+        found, path = cache.get(data, actor_id_1, actor_id_2)
+        if not found:
+            path = get_path(data, actor_id_1, actor_id_2)
+            cache.put(data, actor_id_1, actor_id_2, path)
+        return path
+    acted_with, allowed = make_search_db(data, movie_filter)
+    return find_path(acted_with, actor_id_1, actor_id_2, allowed)
+
+
+def find_path(acted_with, actor_id_1, actor_id_2, allowed=None):
+    """
+    Helper function for get_path, which does the search itself given an
+    already-built neighbor db (and optionally a set of allowed movies, as in
+    expand).  Useful when answering many queries against the same graph.
     """
-    acted_with = make_neighbor_db(data)
     # Intialize the parents and the first level (starting from actor_id_1).
     # actor_id_1 is our root (it has no parent), and it is the only element in
     # the set of things that have 0 distance from
@@ -102,11 +252,144 @@ def get_path(data, actor_id_1, actor_id_2):
     # elements at the current level (we explored the whole space and never
     # found actor_id_2!).
     while actor_id_2 not in cur_level and cur_level:
-        cur_level = expand(acted_with, cur_level, parents)
+        cur_level = expand(acted_with, cur_level, parents, allowed)
     # If we failed to find a path, we return None.  Otherwise we return the
     # path from actor_id_1 to actor_id_2 (using the trace_path helper).
     return trace_path(actor_id_2, parents) if actor_id_2 in cur_level else None
 
+
+def get_path_bidirectional(data, actor_id_1, actor_id_2):
+    """
+    Return a shortest path of actor IDs connecting actor_id_1 to actor_id_2,
+    like get_path, but searching outward from both ends at once (always
+    expanding the smaller of the two frontiers) and stopping when the two
+    searches meet.  This usually explores far fewer actors than get_path.
+    """
+    return find_path_bidirectional(make_neighbor_db(data), actor_id_1, actor_id_2)
+
+
+def find_path_bidirectional(acted_with, actor_id_1, actor_id_2):
+    """
+    Helper function for get_path_bidirectional, which does the search itself
+    given an already-built neighbor db (as find_path does for get_path).
+    """
+    if actor_id_1 == actor_id_2:
+        return [actor_id_1]
+    # each side of the search has its own parents dictionary, a mapping from
+    # the actors it has seen to their distance from its root, and a current
+    # level.
+    sides = [[{actor_id_1: None}, {actor_id_1: 0}, {actor_id_1}],
+             [{actor_id_2: None}, {actor_id_2: 0}, {actor_id_2}]]
+    while sides[0][2] and sides[1][2]:
+        this = 0 if len(sides[0][2]) <= len(sides[1][2]) else 1
+        parents, depth, cur_level = sides[this]
+        n = depth[set_peek(cur_level)]
+        new_level = expand(acted_with, cur_level, parents)
+        for actor in new_level:
+            depth[actor] = n + 1
+        sides[this][2] = new_level
+        # the actors seen by both searches are where the paths meet.  the other
+        # side's distances may differ by one, so take the closest meeting
+        # point.
+        other_depth = sides[1 - this][1]
+        meet = [actor for actor in new_level if actor in other_depth]
+        if meet:
+            best = min(meet, key=lambda actor: other_depth[actor])
+            return trace_path(best, sides[0][0]) + trace_path(best, sides[1][0])[-2::-1]
+    return None
+
+
+def set_peek(s):
+    """
+    Helper function: return an arbitrary element that is in the given set
+    without modifying the set.
+    """
+    for i in s:
+        return i
+
+
+def make_search_db(data, movie_filter=None):
+    """
+    Helper function for the path searches.  Returns the neighbor db to pass to
+    expand, along with the set of allowed movies (or None when not filtering).
+    """
+    if movie_filter is None:
+        return make_neighbor_db(data), None
+    return make_neighbor_movie_db(data), allowed_movies(data, movie_filter)
+
+
+def get_all_parents(data, actor_id_1, actor_id_2, movie_filter=None):
+    """
+    Search outward from actor_id_1 (as get_path does) until reaching
+    actor_id_2, recording all of the parents of each actor.  Returns the
+    parents dictionary, in which each actor maps to a list of the actors one
+    step closer to actor_id_1 on some shortest path (actor_id_1 itself maps to
+    an empty list), or None if there is no path.
+    """
+    acted_with, allowed = make_search_db(data, movie_filter)
+    parents = {actor_id_1: []}
+    cur_level = {actor_id_1}
+    while actor_id_2 not in cur_level and cur_level:
+        cur_level = expand(acted_with, cur_level, parents, allowed, all_parents=True)
+    return parents if actor_id_2 in cur_level else None
+
+
+def count_shortest_paths(data, actor_id_1, actor_id_2, movie_filter=None):
+    """
+    Returns the number of different shortest paths connecting actor_id_1 to
+    actor_id_2 (0 if they are not connected), without building the paths.
+    """
+    parents = get_all_parents(data, actor_id_1, actor_id_2, movie_filter)
+    if parents is None:
+        return 0
+    # the number of shortest paths to an actor is the sum of the numbers of
+    # shortest paths to each of their parents.  we compute these counts
+    # depth-first from actor_id_2, using a stack rather than recursion so
+    # that long paths can't hit the recursion limit.
+    counts = {}
+    stack = [actor_id_2]
+    while stack:
+        person = stack[-1]
+        if person in counts:
+            stack.pop()
+            continue
+        missing = [p for p in parents[person] if p not in counts]
+        if missing:
+            stack.extend(missing)
+            continue
+        stack.pop()
+        counts[person] = sum(counts[p] for p in parents[person]) if parents[person] else 1
+    return counts[actor_id_2]
+
+
+def all_shortest_paths(data, actor_id_1, actor_id_2, movie_filter=None):
+    """
+    Generator yielding every shortest path (as a list of actor IDs) connecting
+    actor_id_1 to actor_id_2, one at a time.  Yields nothing if there is no
+    path.
+    """
+    parents = get_all_parents(data, actor_id_1, actor_id_2, movie_filter)
+    if parents is not None:
+        yield from trace_all_paths(actor_id_2, parents)
+
+
+def trace_all_paths(person, parents):
+    """
+    Helper function for all_shortest_paths.  Like trace_path, but for a parents
+    dictionary containing lists of parents: yields every path from the root to
+    the given point.  Only the partial paths still to be explored are kept in
+    memory.
+    """
+    stack = [[person]]
+    while stack:
+        partial = stack.pop()  # a path from person back towards the root
+        if not parents[partial[-1]]:
+            yield partial[::-1]
+        else:
+            for parent in reversed(parents[partial[-1]]):
+                stack.append(partial + [parent])
+
+
 def trace_path(person, parents):
     """
     Helper function for get_path.  This traces back through the parent
@@ -138,34 +421,120 @@ def get_movie_name_map():
         return json.load(f)
 
 
+def actor_pair_key(actor_id_1, actor_id_2):
+    """
+    Returns a single integer identifying the unordered pair of the given actors
+    (the same for both orders), by packing the smaller ID into the high 32 bits
+    and the larger into the low 32 bits.  Actor IDs must be non-negative
+    integers less than 2**32.
+
+    Unlike a frozenset, this is cheap to build and to hash, and takes up a
+    fraction of the memory when stored as a dictionary key.
+    """
+    if actor_id_1 > actor_id_2:
+        actor_id_1, actor_id_2 = actor_id_2, actor_id_1
+    return (actor_id_1 << 32) | actor_id_2
+
+
 def get_actors_to_movie_db(data):
     """
     Helper function for get_movie_path.  Returns a mapping from pairs of actors
-    to the ID number of a movie in which they acted together.
+    (as keys from actor_pair_key) to the ID number of a movie in which they
+    acted together.
+    """
+    return {actor_pair_key(a1, a2): m for a1, a2, m in data}
+
+
+def make_bacon_distances(acted_with, root=BACON):
+    """
+    Returns a dictionary mapping every actor reachable from root (in the given
+    neighbor db) to their distance from root, i.e. their Bacon number when
+    root is BACON.
     """
-    out = {}
-    for a1, a2, m in data:
-        out[frozenset({a1, a2})] = m
-    return out
+    distances = {root: 0}
+    parents = {root: None}
+    cur_level = {root}
+    n = 0
+    while cur_level:
+        n += 1
+        cur_level = expand(acted_with, cur_level, parents)
+        for actor in cur_level:
+            distances[actor] = n
+    return distances
+
+
+def add_films(acted_with, movie_db, triples, distances=None, cache=None):
+    """
+    Add new [actor, actor, movie] triples to an existing neighbor db (from
+    make_neighbor_db) and an existing actors-to-movie map (from
+    get_actors_to_movie_db), modifying both in place.
+
+    If a distance table from make_bacon_distances is given, it is updated in
+    place as well.  Adding edges can only make distances shorter, so rather
+    than recomputing the whole table, we start from the endpoints of the new
+    edges whose distance improved and re-relax only the actors whose distance
+    changes as a result.  If a PathCache is given, it is invalidated.
+    """
+    for a1, a2, m in triples:
+        acted_with.setdefault(a1, set()).add(a2)
+        acted_with.setdefault(a2, set()).add(a1)
+        movie_db[actor_pair_key(a1, a2)] = m
+
+    if cache is not None:
+        cache.invalidate()
+
+    if distances is None:
+        return
+
+    # buckets maps a distance to the actors whose distance was lowered to that
+    # value.  processing the buckets in increasing order of distance means that
+    # each actor is finalized the first time we see it with its current
+    # distance (stale entries, lowered again since they were added, are
+    # skipped).
+    buckets = {}
+    for a1, a2, _ in triples:
+        for x, y in ((a1, a2), (a2, a1)):
+            if x in distances and distances[x] + 1 < distances.get(y, distances[x] + 2):
+                distances[y] = distances[x] + 1
+                buckets.setdefault(distances[y], []).append(y)
+
+    while buckets:
+        d = min(buckets)
+        for actor in buckets.pop(d):
+            if distances[actor] != d:
+                continue
+            for neighbor in acted_with[actor]:
+                if d + 1 < distances.get(neighbor, d + 2):
+                    distances[neighbor] = d + 1
+                    buckets.setdefault(d + 1, []).append(neighbor)
 
 
-def get_movie_path(data, actor_name_1, actor_name_2):
+def get_movie_path(data, actor_name_1, actor_name_2, cache=None, movie_filter=None):
     """
     Returns a list of movie names that connect the two given actors (here given
-    as names, not as IDs)
+    as names, not as IDs).  The optional PathCache and movie_filter are used as
+    in get_path.
     """
     # We start by creating a few useful mappings using the helper functions
     # above.
-    movie_db = get_actors_to_movie_db(data)
     movie_name_db = {v: k for k,v in get_movie_name_map().items()}
     id_from_name = get_actor_name_map()
     # Next, determine the ID numbers of the given actors.
     actor_id_1 = id_from_name[actor_name_1]
     actor_id_2 = id_from_name[actor_name_2]
-    # Find the path between them in terms of actors normally.
-    actor_path = get_path(data, actor_id_1, actor_id_2)
-    # Look up the movie ID numbers that connect each successive pair of actors.
-    movie_id_path = [movie_db[frozenset(x)] for x in zip(actor_path, actor_path[1:])]
+    # Find the path between them in terms of actors, and look up the movie ID
+    # numbers that connect each successive pair of actors.  When filtering,
+    # the pair may have made several movies together, and we need to pick one
+    # that passes the filter; the same mappings serve for the search and for
+    # that, so we build them only once.
+    if movie_filter is None:
+        actor_path = get_path(data, actor_id_1, actor_id_2, cache)
+        movie_db = get_actors_to_movie_db(data)
+        movie_id_path = [movie_db[actor_pair_key(a, b)] for a, b in zip(actor_path, actor_path[1:])]
+    else:
+        movies_with, allowed = make_search_db(data, movie_filter)
+        actor_path = find_path(movies_with, actor_id_1, actor_id_2, allowed)
+        movie_id_path = [min(movies_with[a][b] & allowed) for a, b in zip(actor_path, actor_path[1:])]
     # And, finally, convert the movie ID numbers into names.
     return [movie_name_db[i] for i in movie_id_path]
 
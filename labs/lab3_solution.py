@@ -1,13 +1,76 @@
+# A game is a dictionary with "dimensions", "board", "mask" and "state" keys.
+# The board and mask are lists of rows: the board holds the number of
+# neighboring bombs in each square (or '.' for bombs), and the mask holds True
+# for revealed squares and False for hidden ones.  This is the format the lab's
+# tests and UI use, and the one new_game, dig, render and render_ascii take.
+#
+# For large boards, and for keeping many games around (as minesweeper_server
+# does), the flat_* functions work on "flat games" instead.  Those have the same
+# keys plus "covered", with the board and mask stored flat, in row-major order
+# (the square at row r and column c is at index r*ncols + c): the board is a
+# bytearray holding the number of neighboring bombs in each square (or BOMB),
+# and the mask is a bytearray holding 1 for revealed squares and 0 for hidden
+# ones.  "covered" counts the safe squares that are still hidden, so that
+# checking for victory doesn't need to look at the whole board (it is counted
+# by the flat_* functions if a flat game doesn't have it).  game_to_flat
+# and flat_to_game convert between the two.
+
+# no square has more than 8 neighbors, so BOMB can't be a count (unless a bomb
+# is listed over and over: like new_game, the flat functions count a bomb given
+# twice twice).
+BOMB = 255
+RENDER_CHARS = [' '] + [str(v) for v in range(1, BOMB)] + ['.']  # indexed by board value
+
+# maps a number of columns to the (row step, column step, index step) of each
+# of the 8 neighbors of a square.
+neighbor_offsets = {}
+
+
+def get_neighbor_offsets(ncols):
+    """
+    Returns the (row step, column step, index step) triples leading from a
+    square to each of its neighbors, on a board with ncols columns.
+    """
+    if ncols not in neighbor_offsets:
+        neighbor_offsets[ncols] = [(i, j, i*ncols + j) for i in range(-1, 2)
+                                   for j in range(-1, 2) if i or j]
+    return neighbor_offsets[ncols]
+
+
 def neighbors(dimensions, r, c):
-    all_neighbors = [(r+i, c+j) for i in range(-1,2) for j in range(-1, 2)]
-    return [(x,y) for (x,y) in all_neighbors if 0 <= x < dimensions[0] and 0 <= y < dimensions[1]]
+    """
+    Returns the (row, column) locations of the squares around (r, c), including
+    (r, c) itself.
+    """
+    all_neighbors = [(r+i, c+j) for i in range(-1, 2) for j in range(-1, 2)]
+    return [(x, y) for (x, y) in all_neighbors if 0 <= x < dimensions[0] and 0 <= y < dimensions[1]]
 
 
 def make_board(nrows, ncols, elem):
+    """
+    Returns a board (a list of nrows rows) with elem in every square.
+    """
     return [[elem for c in range(ncols)] for r in range(nrows)]
 
 
+def flat_neighbors(dimensions, index):
+    """
+    Returns the flat indices of the squares adjacent to the square at the given
+    flat index (not including that square itself).
+    """
+    nrows, ncols = dimensions
+    r, c = divmod(index, ncols)
+    offsets = get_neighbor_offsets(ncols)
+    if 0 < r < nrows - 1 and 0 < c < ncols - 1:
+        # away from the edges, every neighbor exists.
+        return [index + d for _, _, d in offsets]
+    return [index + d for i, j, d in offsets if 0 <= r+i < nrows and 0 <= c+j < ncols]
+
+
 def new_game(num_rows, num_cols, bombs):
+    """
+    Start a new game, with bombs at the given (row, column) locations.
+    """
     mask = make_board(num_rows, num_cols, False)
     board = make_board(num_rows, num_cols, 0)
     for br, bc in bombs:
@@ -16,10 +79,118 @@ def new_game(num_rows, num_cols, bombs):
         for nr, nc in neighbors([num_rows, num_cols], br, bc):
             if board[nr][nc] != '.':
                 board[nr][nc] += 1
-    return {"dimensions": [num_rows, num_cols], "board" : board, "mask" : mask, "state": "ongoing"}
+    return {"dimensions": [num_rows, num_cols], "board": board, "mask": mask, "state": "ongoing"}
+
+
+def new_flat_game(num_rows, num_cols, bombs):
+    """
+    Start a new flat game, with bombs at the given (row, column) locations.
+    """
+    dimensions = [num_rows, num_cols]
+    board = bytearray(num_rows * num_cols)
+    for br, bc in bombs:
+        board[br*num_cols + bc] = BOMB
+    for br, bc in bombs:
+        for n in flat_neighbors(dimensions, br*num_cols + bc):
+            if board[n] != BOMB:
+                board[n] += 1
+    return {"dimensions": dimensions, "board": board,
+            "mask": bytearray(num_rows * num_cols), "state": "ongoing",
+            "covered": len(board) - board.count(BOMB)}
+
+
+def flat_to_game(flat):
+    """
+    Returns the given flat game as a game (a dictionary of nested lists, with
+    '.' for bombs and booleans in the mask).
+    """
+    nrows, ncols = flat["dimensions"]
+    board = ['.' if v == BOMB else v for v in flat["board"]]
+    mask = [bool(v) for v in flat["mask"]]
+    return {"dimensions": list(flat["dimensions"]),
+            "board": [board[r*ncols:(r+1)*ncols] for r in range(nrows)],
+            "mask": [mask[r*ncols:(r+1)*ncols] for r in range(nrows)],
+            "state": flat["state"]}
+
+
+def game_to_flat(game):
+    """
+    Returns the given game (a dictionary of nested lists) as a flat game.
+    """
+    board = bytearray(BOMB if v == '.' else v for row in game["board"] for v in row)
+    mask = bytearray(1 if v else 0 for row in game["mask"] for v in row)
+    flat = {"dimensions": list(game["dimensions"]), "board": board, "mask": mask,
+            "state": game["state"]}
+    flat["covered"] = flat_covered_squares(flat)
+    return flat
+
+
+# Binary snapshots of games are lab 4's HyperMines snapshots (see
+# lab4_solution.encode_snapshot), so a 2-D game saved by either lab loads in
+# the other.  lab4_solution is imported only when a snapshot is made or read,
+# so that this file still works on its own (as the lab's tests and UI use it).
+
+def flat_to_bytes(game):
+    """
+    Returns a compact binary snapshot (bytes) of the given flat game.
+    """
+    import lab4_solution
+    covered = game["covered"] if "covered" in game else flat_covered_squares(game)
+    revealed_bombs = 0
+    if game["state"] == "defeat":
+        revealed_bombs = sum(1 for v, m in zip(game["board"], game["mask"]) if v == BOMB and m)
+    board = ['.' if v == BOMB else v for v in game["board"]]
+    return lab4_solution.encode_snapshot(game["dimensions"], board, game["mask"],
+                                         game["state"], covered, revealed_bombs)
+
+
+def flat_from_bytes(data):
+    """
+    Returns the flat game stored in a snapshot made by flat_to_bytes (or
+    game_to_bytes, or HyperMinesGame.to_bytes for a 2-D game).
+    """
+    import lab4_solution
+    dims, board, mask, state, covered, _ = lab4_solution.decode_snapshot(data)
+    if len(dims) != 2:
+        raise ValueError('not a 2-D minesweeper snapshot')
+    return {"dimensions": dims, "board": bytearray(BOMB if v == '.' else v for v in board),
+            "mask": mask, "state": state, "covered": covered}
+
+
+def game_to_bytes(game):
+    """
+    Returns a compact binary snapshot (bytes) of the game.
+    """
+    return flat_to_bytes(game_to_flat(game))
+
+
+def game_from_bytes(data):
+    """
+    Returns the game stored in a snapshot made by game_to_bytes.
+    """
+    return flat_to_game(flat_from_bytes(data))
+
+
+def save_game(game, filename):
+    """
+    Write a snapshot of the game to the given file.
+    """
+    with open(filename, 'wb') as f:
+        f.write(game_to_bytes(game))
+
+
+def load_game(filename):
+    """
+    Returns the game stored (by save_game) in the given file.
+    """
+    with open(filename, 'rb') as f:
+        return game_from_bytes(f.read())
 
 
 def is_victory(game):
+    """
+    Returns True if every safe square, and no bomb, has been revealed.
+    """
     for r in range(game["dimensions"][0]):
         for c in range(game["dimensions"][1]):
             if game["board"][r][c] == '.' and game["mask"][r][c]:
@@ -29,47 +200,148 @@ def is_victory(game):
     return True
 
 
+def flat_covered_squares(game):
+    """
+    Returns the number of safe squares of the given flat game that are still
+    hidden (what its "covered" key holds).
+    """
+    return sum(1 for v, m in zip(game["board"], game["mask"]) if v != BOMB and not m)
+
+
+def flat_is_victory(game):
+    """
+    Returns True if every safe square, and no bomb, has been revealed in the
+    given flat game.  (A revealed bomb always ends the game in defeat.)
+    """
+    if "covered" not in game:
+        game["covered"] = flat_covered_squares(game)
+    return game["covered"] == 0 and game["state"] != "defeat"
+
+
 def dump(game):
+    """
+    Print a human-readable representation of the game.
+    """
     lines = ["dimensions: {}".format(game["dimensions"]),
              "board: {}".format("\n       ".join(map(str, game["board"]))),
              "mask:  {}".format("\n       ".join(map(str, game["mask"])))]
     print("\n".join(lines))
 
 
+def flood_fill(start, opens, neighbors, reveal):
+    """
+    Reveal the squares around start (which has already been revealed) if
+    opens(start) is True, meaning that it has no neighboring bombs, and so on
+    outward.  neighbors(square) gives the squares around a square, and
+    reveal(square) reveals a square, returning False if it was already
+    revealed.  Returns the number of squares revealed, including start.
+
+    This is shared by dig and flat_dig, which only differ in how they name
+    and store squares.  The squares whose neighbors still need to be looked at
+    are kept on a stack rather than recursing, which would hit Python's
+    recursion limit on large open boards.  The neighbors of a square that
+    opens can't be bombs, so they are all safe to reveal.
+    """
+    count = 1
+    stack = [start]
+    while stack:
+        square = stack.pop()
+        if opens(square):
+            for n in neighbors(square):
+                if reveal(n):
+                    count += 1
+                    stack.append(n)
+    return count
+
+
 def dig(game, row, col):
-    if game['state'] != 'ongoing' or game['mask'][row][col]:
+    """
+    Reveal the square at (row, col).  If it has no neighboring bombs, its
+    neighbors are revealed as well, and so on outward.  Returns the number of
+    squares revealed.
+    """
+    board, mask = game["board"], game["mask"]
+    if game['state'] != 'ongoing' or mask[row][col]:
         return 0
 
-    if game["board"][row][col] == '.':
-        game["mask"][row][col] = True
+    if board[row][col] == '.':
+        mask[row][col] = True
         game['state'] = 'defeat'
         return 1
 
-    count = 1
-    game['mask'][row][col] = True
-    if game['board'][row][col] == 0:
-        for nr, nc in neighbors(game['dimensions'], row, col):
-            count += dig(game, nr, nc)
+    def reveal(square):
+        r, c = square
+        if mask[r][c]:
+            return False
+        mask[r][c] = True
+        return True
 
+    reveal((row, col))
+    count = flood_fill((row, col), lambda square: board[square[0]][square[1]] == 0,
+                       lambda square: neighbors(game['dimensions'], *square), reveal)
+
+    # is_victory stops at the first hidden safe square, so this is quick
+    # unless the game is nearly won.
     game['state'] = 'victory' if is_victory(game) else 'ongoing'
     return count
 
 
+def flat_dig(game, row, col):
+    """
+    Reveal the square at (row, col) of the given flat game, as dig does.
+    Returns the number of squares revealed.
+    """
+    index = row*game["dimensions"][1] + col
+    board, mask = game["board"], game["mask"]
+    if game['state'] != 'ongoing' or mask[index]:
+        return 0
+    if "covered" not in game:
+        game["covered"] = flat_covered_squares(game)
+
+    if board[index] == BOMB:
+        mask[index] = 1
+        game['state'] = 'defeat'
+        return 1
+
+    def reveal(i):
+        if mask[i]:
+            return False
+        mask[i] = 1
+        return True
+
+    reveal(index)
+    count = flood_fill(index, lambda i: board[i] == 0,
+                       lambda i: flat_neighbors(game['dimensions'], i), reveal)
+
+    game['covered'] -= count
+    game['state'] = 'victory' if flat_is_victory(game) else 'ongoing'
+    return count
+
+
 def render(game, xray=False):
+    """
+    Returns the board as a list of rows of characters: '_' for hidden squares,
+    '.' for bombs, ' ' for squares with no neighboring bombs, and '1', '2',
+    etc. otherwise.  If xray is True, every square is shown.
+    """
+    return [[(' ' if v == 0 else str(v)) if xray or m else '_' for v, m in zip(row, mask_row)]
+            for row, mask_row in zip(game['board'], game['mask'])]
+
+
+def flat_render(game, xray=False):
+    """
+    Returns the given flat game's board rendered as render does.
+    """
     nrows, ncols = game['dimensions']
-    board = [[None for i in range(ncols)] for j in range(nrows)]
-    for r in range(nrows):
-        for c in range(ncols):
-            if xray or game['mask'][r][c]:
-                current = board[r][c]
-                if game['board'][r][c] == 0:
-                    board[r][c] = ' '
-                else:
-                    board[r][c] = str(game['board'][r][c])
-            else:
-                board[r][c] = '_'
-    return board
+    if xray:
+        chars = [RENDER_CHARS[v] for v in game['board']]
+    else:
+        chars = [RENDER_CHARS[v] if m else '_' for v, m in zip(game['board'], game['mask'])]
+    return [chars[r*ncols:(r+1)*ncols] for r in range(nrows)]
 
 
 def render_ascii(game, xray=False):
+    """
+    Returns render(game, xray) as a single string, one line per row.
+    """
     return "\n".join("".join(r) for r in render(game, xray=xray))
@@ -1,7 +1,5 @@
 """6.009 Lab 4 -- HyperMines"""
 
-import sys
-sys.setrecursionlimit(10000)
 # NO ADDITIONAL IMPORTS
 
 
@@ -21,6 +19,27 @@ def make_nd_board(dims, fill):
         return [make_nd_board(dims[1:], fill) for i in range(dims[0])]
 
 
+# caches for neighbor_offsets and neighbor_steps
+offsets_cache = {}
+steps_cache = {}
+
+
+def neighbor_offsets(ndims):
+    """
+    Returns the list of the 3**ndims offset vectors (tuples of -1, 0 and 1)
+    leading from a location in an ndims-dimensional space to its neighbors
+    (including the location itself).  Computed once per dimensionality.
+    >>> neighbor_offsets(1)
+    [(-1,), (0,), (1,)]
+    """
+    if ndims not in offsets_cache:
+        out = [()]
+        for _ in range(ndims):
+            out = [o + (x, ) for o in out for x in (-1, 0, 1)]
+        offsets_cache[ndims] = out
+    return offsets_cache[ndims]
+
+
 def nd_neighbors(loc, dims):
     """
     Generator to yield the neighbors of a given location.
@@ -34,17 +53,52 @@ def nd_neighbors(loc, dims):
     >>> set(near) == {(0, 0, 1), (0, 1, 1), (0, 0, 2), (0, 1, 2)}
     True
     """
-    if len(loc) == 0:
-        # base case is 0-d
-        # yield a single tuple so the 1-d case can build on this
-        yield tuple()
-    else:
-        # recursive case.  find the neighbors of loc[1:] in a space of lower
-        # dimensionality.  then add x-1, x, and x+1 to the front of each
-        # neighbor in the lower-d space, where x is the coordinate in this
-        # dimension.
-        for j in nd_neighbors(loc[1:], dims[1:]):
-            yield from (((x, )+j) for x in (loc[0]-1, loc[0], loc[0]+1) if 0<=x<dims[0])
+    for offset in neighbor_offsets(len(loc)):
+        n = tuple(x + o for x, o in zip(loc, offset))
+        if all(0 <= x < d for x, d in zip(n, dims)):
+            yield n
+
+
+def edge_signature(index, dims):
+    """
+    Describes where the location at the given index of a flat array (with the
+    given dimensions) sits relative to the edges of the space: a tuple with,
+    for each dimension, 0 if the coordinate is the first along that
+    dimension, 2 if it is the last, 3 if it is both, and 1 otherwise.  All
+    locations with the same signature have the same pattern of neighbors.
+    >>> edge_signature(5, [2, 3])
+    (2, 2)
+    >>> edge_signature(4, [3, 3])
+    (1, 1)
+    """
+    out = [1] * len(dims)
+    for i in range(len(dims) - 1, -1, -1):
+        index, x = divmod(index, dims[i])
+        if x == 0:
+            out[i] = 3 if dims[i] == 1 else 0
+        elif x == dims[i] - 1:
+            out[i] = 2
+    return tuple(out)
+
+
+def neighbor_steps(dims, signature):
+    """
+    Returns the list of flat index steps (for a flat array with the given
+    dimensions) leading from a location with the given edge signature to each
+    of its neighbors, including itself.  Computed once per dimensions and
+    signature, so finding the neighbors of a location only takes working out
+    its signature and adding these steps to its index.
+    >>> neighbor_steps([2, 3], (2, 2))
+    [-4, -3, -1, 0]
+    """
+    key = (tuple(dims), signature)
+    if key not in steps_cache:
+        allowed = {0: (0, 1), 1: (-1, 0, 1), 2: (-1, 0), 3: (0, )}
+        strides = make_strides(dims)
+        steps_cache[key] = [flat_index(offset, strides)
+                            for offset in neighbor_offsets(len(dims))
+                            if all(o in allowed[s] for o, s in zip(offset, signature))]
+    return steps_cache[key]
 
 
 def nd_get(array, loc):
@@ -91,7 +145,219 @@ def all_coords(dims):
 
 
 
+def make_strides(dims):
+    """
+    Returns the strides of a flat, row-major array with the given dimensions:
+    how far apart in the flat array two locations are when they differ by one
+    in each coordinate.
+    >>> make_strides([2, 4, 3])
+    [12, 3, 1]
+    """
+    out = [1] * len(dims)
+    for i in range(len(dims) - 2, -1, -1):
+        out[i] = out[i+1] * dims[i+1]
+    return out
+
+
+def flat_index(loc, strides):
+    """
+    Returns the index in a flat array (with the given strides) of the given
+    location.
+    >>> flat_index([1, 2, 0], make_strides([2, 4, 3]))
+    18
+    """
+    return sum(x * s for x, s in zip(loc, strides))
+
+
+def flat_coords(index, dims):
+    """
+    Returns the location (as a tuple) of the given index in a flat array with
+    the given dimensions.  The inverse of flat_index.
+    >>> flat_coords(18, [2, 4, 3])
+    (1, 2, 0)
+    """
+    out = [0] * len(dims)
+    for i in range(len(dims) - 1, -1, -1):
+        index, out[i] = divmod(index, dims[i])
+    return tuple(out)
+
+
+def nd_from_flat(flat, dims):
+    """
+    Returns an n-dimensional array (nested lists) with the given dimensions,
+    whose elements in row-major order are those of the given flat array.
+    >>> nd_from_flat([1, 2, 3, 4, 5, 6], [2, 3])
+    [[1, 2, 3], [4, 5, 6]]
+    """
+    out = list(flat)
+    for d in reversed(dims[1:]):
+        out = [out[i:i+d] for i in range(0, len(out), d)]
+    return out
+
+
+def nd_flatten(array, ndims):
+    """
+    Returns the elements of an n-dimensional array (nested lists) as a flat
+    list in row-major order.  The inverse of nd_from_flat.
+    >>> nd_flatten([[1, 2, 3], [4, 5, 6]], 2)
+    [1, 2, 3, 4, 5, 6]
+    """
+    out = array
+    for _ in range(ndims - 1):
+        out = [x for sub in out for x in sub]
+    return list(out)
+
+
+def region_indices(dims, region):
+    """
+    Returns the flat indices (for a flat array with the given dimensions) of
+    the locations in a region of the space, in row-major order.  The region is
+    given as a list of (start, stop) ranges, one per dimension.
+    >>> region_indices([3, 4], [(1, 3), (2, 4)])
+    [6, 7, 10, 11]
+    """
+    out = [0]
+    for (start, stop), stride in zip(region, make_strides(dims)):
+        out = [i + x*stride for i in out for x in range(start, stop)]
+    return out
+
+
+# Binary snapshots of games.  A snapshot is laid out as:
+#   * the 4 bytes SNAPSHOT_MAGIC,
+#   * one byte each for the state (an index into SNAPSHOT_STATES), the number
+#     of dimensions, and the cell width (0 for half a byte, otherwise a number
+#     of bytes),
+#   * 4 bytes for each dimension, and 8 each for the covered and
+#     revealed_bombs counts (all big-endian),
+#   * the board, one cell per width (the largest value that fits in the width
+#     stands for a bomb, and neighbor counts are stored as they are), and
+#   * the mask, one bit per square (the lowest bit of the first byte is the
+#     first square).
+SNAPSHOT_MAGIC = b'HMS1'
+SNAPSHOT_STATES = ['ongoing', 'victory', 'defeat']
+BITS_TO_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+DIGITS_TO_BITS = bytes.maketrans(b'01', b'\x00\x01')
+# the two half-byte cells packed in each possible byte
+NIBBLE_PAIRS = [tuple('.' if x == 15 else x for x in (b >> 4, b & 15)) for b in range(256)]
+
+
+def pack_bits(flags):
+    """
+    Returns a bitset (as bytes) with one bit for each 0 or 1 in the given
+    bytearray.
+    >>> pack_bits(bytearray([1, 0, 0, 0, 0, 0, 0, 0, 1]))
+    b'\\x01\\x01'
+    """
+    # let int do the packing, by reading the flags (last first) as the digits
+    # of a binary number.
+    digits = bytes(flags).translate(BITS_TO_DIGITS)[::-1] or b'0'
+    return int(digits, 2).to_bytes((len(flags) + 7) // 8, 'little')
+
+
+def unpack_bits(data, n):
+    """
+    Returns a bytearray of the first n bits in the given bitset, as 0s and 1s.
+    The inverse of pack_bits.
+    >>> list(unpack_bits(b'\\x01\\x01', 9))
+    [1, 0, 0, 0, 0, 0, 0, 0, 1]
+    """
+    digits = bin(int.from_bytes(data, 'little'))[2:].zfill(n)[::-1][:n]
+    return bytearray(digits.encode().translate(DIGITS_TO_BITS))
+
+
+def encode_snapshot(dims, flat_board, flat_mask, state, covered, revealed_bombs):
+    """
+    Returns a compact binary snapshot (bytes) of a game with the given flat
+    board and mask, state and counts.  Boards whose counts are all below 15
+    (including every board with up to 2 dimensions) take half a byte per
+    square.
+    >>> snap = encode_snapshot([1, 3], ['.', 1, 0], bytearray([0, 1, 1]), 'ongoing', 0, 0)
+    >>> len(snap)
+    34
+    """
+    cells = [v for v in flat_board if v != '.']
+    top = max(cells) if cells else 0
+    if top < 15:
+        width, bomb = 0, 15
+    else:
+        width = 1 if top < 255 else 2 if top < 65535 else 4
+        bomb = 256**width - 1
+    vals = [bomb if v == '.' else v for v in flat_board]
+    if width == 0:
+        if len(vals) % 2:
+            vals.append(0)
+        board = bytes([a << 4 | b for a, b in zip(vals[::2], vals[1::2])])
+    elif width == 1:
+        board = bytes(vals)
+    else:
+        board = b''.join(v.to_bytes(width, 'big') for v in vals)
+    header = (SNAPSHOT_MAGIC + bytes([SNAPSHOT_STATES.index(state), len(dims), width])
+              + b''.join(d.to_bytes(4, 'big') for d in dims)
+              + covered.to_bytes(8, 'big') + revealed_bombs.to_bytes(8, 'big'))
+    return header + board + pack_bits(flat_mask)
+
+
+def decode_snapshot(data):
+    """
+    Returns a tuple (dims, flat_board, flat_mask, state, covered,
+    revealed_bombs) read from a snapshot made by encode_snapshot.
+    >>> decode_snapshot(encode_snapshot([1, 3], ['.', 1, 0], bytearray([0, 1, 1]), 'ongoing', 0, 0))
+    ([1, 3], ['.', 1, 0], bytearray(b'\\x00\\x01\\x01'), 'ongoing', 0, 0)
+    >>> decode_snapshot(b'HMS1\\x07' + bytes(40))
+    Traceback (most recent call last):
+    ...
+    ValueError: not a HyperMines snapshot
+    """
+    if data[:4] != SNAPSHOT_MAGIC or data[4] >= len(SNAPSHOT_STATES) or data[6] not in (0, 1, 2, 4):
+        raise ValueError('not a HyperMines snapshot')
+    state, ndims, width = data[4], data[5], data[6]
+    pos = 7
+    dims = [int.from_bytes(data[pos + 4*i:pos + 4*i + 4], 'big') for i in range(ndims)]
+    pos += 4 * ndims
+    covered = int.from_bytes(data[pos:pos+8], 'big')
+    revealed_bombs = int.from_bytes(data[pos+8:pos+16], 'big')
+    pos += 16
+    size = 1
+    for d in dims:
+        size *= d
+    if width == 0:
+        end = pos + (size + 1) // 2
+        board = [x for b in data[pos:end] for x in NIBBLE_PAIRS[b]][:size]
+    else:
+        end = pos + width * size
+        bomb = 256**width - 1
+        if width == 1:
+            vals = data[pos:end]
+        else:
+            vals = [int.from_bytes(data[i:i+width], 'big') for i in range(pos, end, width)]
+        board = ['.' if v == bomb else v for v in vals]
+    mask = unpack_bits(data[end:], size)
+    return dims, board, mask, SNAPSHOT_STATES[state], covered, revealed_bombs
+
+
 class HyperMinesGame:
+    """
+    A game of HyperMines.  The board and mask are stored flat, in row-major
+    order: the square at coordinates c is at index flat_index(c, self.strides)
+    of self.flat_board (which holds '.' for bombs and neighbor counts
+    otherwise) and of self.flat_mask (a bytearray, holding 1 for revealed
+    squares).  The board and mask attributes give n-dimensional copies of
+    these.
+
+    The game also keeps count of the safe squares that are still covered
+    (self.covered) and of the bombs that have been revealed
+    (self.revealed_bombs), so that checking for victory is instant.
+
+    Once the game has been rendered, the rendered squares are kept (in
+    self.rendered, a flat list) and dig updates just the squares it reveals,
+    so later renders don't have to look at the whole board again.  Likewise,
+    once render_delta has been called, dig keeps the squares it reveals (in
+    self.delta) for the next call.  These are only kept up to date by dig, so
+    the mask should not be changed directly after the game is rendered.
+    """
+
+    rendered = None
+    delta = None
 
     def __init__(self, dims, bombs):
         """Start a new game.
@@ -116,17 +382,47 @@ class HyperMinesGame:
                [[False, False], [False, False], [False, False], [False, False]]
         state: ongoing
         """
-        self.board = make_nd_board(dims, 0)
-        for b in bombs:
-            nd_set(self.board, b, '.')
-            for n in nd_neighbors(b, dims):
-                v = nd_get(self.board, n)
-                if isinstance(v, int):
-                    nd_set(self.board, n, v+1)
-        self.mask = make_nd_board(dims, False)
         self.dimensions = dims
+        self.strides = make_strides(dims)
         self.state = 'ongoing'
+        size = 1
+        for d in dims:
+            size *= d
+        self.flat_board = [0] * size
+        self.flat_mask = bytearray(size)
+        for b in bombs:
+            self.flat_board[flat_index(b, self.strides)] = '.'
+        for b in bombs:
+            for n in self.neighbors(flat_index(b, self.strides)):
+                if self.flat_board[n] != '.':
+                    self.flat_board[n] += 1
+        self.covered = size - self.flat_board.count('.')
+        self.revealed_bombs = 0
+
+    @property
+    def board(self):
+        """The board, as an n-dimensional array (a copy).
+        >>> HyperMinesGame([2, 2], [[0, 0]]).board
+        [['.', 1], [1, 1]]
+        """
+        return nd_from_flat(self.flat_board, self.dimensions)
+
+    @property
+    def mask(self):
+        """The mask, as an n-dimensional array of booleans (a copy).
+        >>> HyperMinesGame([1, 2], []).mask
+        [[False, False]]
+        """
+        return nd_from_flat(map(bool, self.flat_mask), self.dimensions)
 
+    def neighbors(self, index):
+        """Return the flat indices of the neighbors of the square at the given
+        flat index (including that square itself).
+        >>> sorted(HyperMinesGame([2, 3], []).neighbors(2))
+        [1, 2, 4, 5]
+        """
+        return [index + step
+                for step in neighbor_steps(self.dimensions, edge_signature(index, self.dimensions))]
 
     def dump(self):
         """Print a human-readable representation of this game."""
@@ -138,11 +434,11 @@ class HyperMinesGame:
 
 
     def dig(self, coords):
-        """Recursively dig up square at coords and neighboring squares.
+        """Dig up square at coords and neighboring squares.
 
-        Update the mask to reveal square at coords; then recursively reveal its
-        neighbors, as long as coords does not contain and is not adjacent to a
-        bomb.  Return a number indicating how many squares were revealed.  No
+        Update the mask to reveal square at coords; then reveal its neighbors
+        (and their neighbors, and so on), as long as the square being expanded
+        does not contain and is not adjacent to a bomb.  Return a number indicating how many squares were revealed.  No
         action should be taken and 0 returned if the incoming state of the game
         is not "ongoing".
 
@@ -187,23 +483,96 @@ class HyperMinesGame:
                [[False, False], [False, False], [False, False], [False, False]]
         state: defeat
         """
-        if self.state != 'ongoing' or nd_get(self.mask, coords):
+        index = flat_index(coords, self.strides)
+        board, mask = self.flat_board, self.flat_mask
+        if self.state != 'ongoing' or mask[index]:
             return 0
 
-        nd_set(self.mask, coords, True)
+        mask[index] = 1
 
-        this_spot = nd_get(self.board, coords)
-        if this_spot == '.':
+        if board[index] == '.':
+            self.revealed_bombs += 1
             self.state = 'defeat'
+            self.record_reveals([index])
             return 1
 
-        count = 1
-        if this_spot == 0:
-            for n in nd_neighbors(coords, self.dimensions):
-                count += self.dig(n)
-
+        # flood fill outward from coords, without recursing (see
+        # lab3_solution.flood_fill); the revealed list doubles as the queue of
+        # squares whose neighbors still need to be looked at.
+        revealed = [index]
+        for i in revealed:
+            if board[i] == 0:
+                for n in self.neighbors(i):
+                    if not mask[n]:
+                        mask[n] = 1
+                        revealed.append(n)
+
+        self.covered -= len(revealed)
         self.state = 'victory' if self.victory() else 'ongoing'
-        return count
+        self.record_reveals(revealed)
+        return len(revealed)
+
+    def value(self, index):
+        """Return the value of the square at the given flat index: '.' for a
+        bomb, and otherwise the number of neighboring bombs.
+        >>> HyperMinesGame([1, 3], [[0, 0]]).value(1)
+        1
+        """
+        return self.flat_board[index]
+
+    def revealed_indices(self):
+        """Return a list of the flat indices of the revealed squares.
+        >>> g = HyperMinesGame([1, 3], [[0, 0]])
+        >>> g.dig([0, 2])
+        2
+        >>> g.revealed_indices()
+        [1, 2]
+        """
+        return [i for i, msk in enumerate(self.flat_mask) if msk]
+
+    def record_reveals(self, indices):
+        """Update the rendered squares (if the game has been rendered) and the
+        squares waiting for render_delta (if it has been called), after dig
+        reveals the squares at the given flat indices.
+        >>> g = HyperMinesGame([1, 3], [[0, 0]])
+        >>> g.render()
+        [['_', '_', '_']]
+        >>> g.flat_mask[1] = 1
+        >>> g.record_reveals([1])
+        >>> g.rendered
+        ['_', '1', '_']
+        """
+        if self.rendered is not None:
+            rendered = self.rendered
+            for i in indices:
+                v = self.value(i)
+                rendered[i] = ' ' if v == 0 else str(v)
+        if self.delta is not None:
+            self.delta.extend(indices)
+
+    def render_delta(self):
+        """Return the squares revealed since the last call, as a list of
+        (coordinates, character) pairs, with characters as in render.  The
+        first call returns every revealed square.  This lets a display that
+        already shows the board be brought up to date without rendering it
+        all again.
+        >>> g = HyperMinesGame([2, 4, 2], [[0, 0, 1], [1, 0, 0], [1, 1, 1]])
+        >>> g.render_delta()
+        []
+        >>> g.dig([0, 2, 1])
+        1
+        >>> g.render_delta()
+        [((0, 2, 1), '1')]
+        >>> g.render_delta()
+        []
+        """
+        indices = self.revealed_indices() if self.delta is None else self.delta
+        self.delta = []
+        out = []
+        for i in indices:
+            v = self.value(i)
+            out.append((flat_coords(i, self.dimensions), ' ' if v == 0 else str(v)))
+        return out
 
     def victory(self):
         """
@@ -214,17 +583,11 @@ class HyperMinesGame:
         False
 
         """
-        for c in all_coords(self.dimensions):
-            brd = nd_get(self.board, c)
-            msk = nd_get(self.mask, c)
-            # two things mean we have not won:
-            if brd == '.' and msk:  # a bomb that has been uncovered.
-                return False
-            if brd != '.' and not msk:  # a safe square that has not be uncovered.
-                return False
-        return True
-
-    def render(self, xray=False):
+        # two things mean we have not won: a bomb that has been uncovered, or a
+        # safe square that has not been uncovered.
+        return self.revealed_bombs == 0 and self.covered == 0
+
+    def render(self, xray=False, region=None):
         """Prepare the game for display.
 
         Returns an N-dimensional array (nested lists) of "_" (hidden squares),
@@ -236,6 +599,8 @@ class HyperMinesGame:
         Args:
            xray (bool): Whether to reveal all tiles or just the ones allowed by
                         the mask
+           region (list): If given, only render this part of the board: a
+                          list of (start, stop) ranges, one per dimension
 
         Returns:
            An n-dimensional array (nested lists)
@@ -253,22 +618,317 @@ class HyperMinesGame:
         >>> g.render(True)
         [[['3', '.'], ['3', '3'], ['1', '1'], [' ', ' ']],
          [['.', '3'], ['3', '.'], ['1', '1'], [' ', ' ']]]
-        """
-        out = make_nd_board(self.dimensions, None)
-        for c in all_coords(self.dimensions):
-            brd = nd_get(self.board, c)
-            msk = nd_get(self.mask, c)
-            nd_set(out, c, '_' if not xray and not msk else ' ' if brd == 0 else str(brd))
-        return out
 
+        >>> g.render(False, [(0, 2), (2, 4), (1, 2)])
+        [[['1'], [' ']], [['1'], [' ']]]
+        """
+        if xray:
+            out = [' ' if brd == 0 else str(brd) for brd in self.flat_board]
+        else:
+            if self.rendered is None:
+                self.rendered = ['_' if not msk else ' ' if brd == 0 else str(brd)
+                                 for brd, msk in zip(self.flat_board, self.flat_mask)]
+            out = self.rendered
+        if region is None:
+            return nd_from_flat(out, self.dimensions)
+        out = [out[i] for i in region_indices(self.dimensions, region)]
+        return nd_from_flat(out, [stop - start for start, stop in region])
+
+    def count_squares(self):
+        """Set the covered and revealed_bombs counts by looking at every
+        square of the board.
+        >>> g = HyperMinesGame([1, 3], [[0, 0]])
+        >>> g.flat_mask[0] = g.flat_mask[2] = 1
+        >>> g.count_squares()
+        >>> g.covered, g.revealed_bombs
+        (1, 1)
+        """
+        self.covered = self.revealed_bombs = 0
+        for brd, msk in zip(self.flat_board, self.flat_mask):
+            if brd == '.':
+                self.revealed_bombs += msk
+            elif not msk:
+                self.covered += 1
 
     @classmethod
     def from_dict(cls, d):
         """Create a new instance of the class with attributes initialized to
-        match those in the given dictionary."""
+        match those in the given dictionary (whose board and mask are
+        n-dimensional arrays, as shown by dump)."""
+        ndims = len(d['dimensions'])
+        return cls.from_flat(d['dimensions'], nd_flatten(d['board'], ndims),
+                             nd_flatten(d['mask'], ndims), d['state'])
+
+    @classmethod
+    def from_flat(cls, dims, flat_board, flat_mask=None, state='ongoing', counts=None):
+        """Create a new instance of the class from a flat board (a list, in
+        row-major order, with '.' for bombs and neighbor counts otherwise),
+        and optionally a flat mask of booleans (nothing is revealed if it is
+        not given).  If the (covered, revealed_bombs) counts are known, they
+        can be given to avoid counting them.
+        >>> g = HyperMinesGame.from_flat([1, 3], ['.', 1, 0], [False, False, True])
+        >>> g.render()
+        [['_', '_', ' ']]
+        >>> g.covered
+        1
+        """
+        game = cls.__new__(cls)
+        game.dimensions = dims
+        game.strides = make_strides(dims)
+        game.state = state
+        game.flat_board = flat_board
+        if flat_mask is None:
+            game.flat_mask = bytearray(len(flat_board))
+        elif isinstance(flat_mask, (bytes, bytearray)):
+            game.flat_mask = bytearray(flat_mask)
+        else:
+            game.flat_mask = bytearray(1 if m else 0 for m in flat_mask)
+        if counts is None:
+            game.count_squares()
+        else:
+            game.covered, game.revealed_bombs = counts
+        return game
+
+    def to_bytes(self):
+        """Return a compact binary snapshot of this game (see
+        encode_snapshot).
+        >>> g = HyperMinesGame([2, 4, 2], [[0, 0, 1], [1, 0, 0], [1, 1, 1]])
+        >>> g.dig([0, 3, 0])
+        8
+        >>> len(g.to_bytes())
+        45
+        """
+        return encode_snapshot(self.dimensions, self.flat_board, self.flat_mask,
+                               self.state, self.covered, self.revealed_bombs)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create a new instance of the class from a snapshot made by
+        to_bytes.
+        >>> g = HyperMinesGame([2, 4, 2], [[0, 0, 1], [1, 0, 0], [1, 1, 1]])
+        >>> g.dig([0, 3, 0])
+        8
+        >>> HyperMinesGame.from_bytes(g.to_bytes()).render()
+        [[['_', '_'], ['_', '_'], ['1', '1'], [' ', ' ']],
+         [['_', '_'], ['_', '_'], ['1', '1'], [' ', ' ']]]
+        """
+        dims, board, mask, state, covered, revealed_bombs = decode_snapshot(data)
+        return cls.from_flat(dims, board, mask, state, (covered, revealed_bombs))
+
+    def save(self, filename):
+        """Write a snapshot of this game to the given file.
+        >>> import os, tempfile
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'game')
+        >>> HyperMinesGame([2, 2], [[0, 0]]).save(filename)
+        >>> HyperMinesGame.load(filename).board
+        [['.', 1], [1, 1]]
+        """
+        with open(filename, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        """Create a new instance of the class from a snapshot saved (by save)
+        in the given file.
+        >>> import os, tempfile
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'game')
+        >>> HyperMinesGame([1, 2], [[0, 1]]).save(filename)
+        >>> HyperMinesGame.load(filename).state
+        'ongoing'
+        """
+        with open(filename, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class SparseHyperMinesGame(HyperMinesGame):
+    """
+    A game of HyperMines for huge spaces with few bombs, where the flat board
+    and mask used by HyperMinesGame would not fit in memory.  Rather than
+    storing every square, this stores the flat indices of the bombs
+    (self.bombs, a set), the neighbor counts that have been needed so far and
+    are not 0 (self.counts, a dictionary), and the values of the squares that
+    have been revealed (self.revealed, a dictionary).  self.size is the
+    number of squares.
+
+    The board and mask attributes (and so dump) still build the whole board,
+    so they should only be used on small spaces; use render with a region to
+    look at part of a large one, and render_delta to follow changes.  Renders
+    are not kept, since they would be as big as the whole space.
+
+    >>> g = SparseHyperMinesGame([50] * 6, [[0, 0, 0, 0, 0, 1]])
+    >>> g.dig([0, 0, 0, 0, 0, 0])
+    1
+    >>> g.render(False, [(0, 1)] * 4 + [(0, 2), (0, 3)])
+    [[[[[['1', '_', '_'], ['_', '_', '_']]]]]]
+    """
+
+    def __init__(self, dims, bombs):
+        """Start a new game.  As in HyperMinesGame, a bomb listed more than
+        once counts that many times towards its neighbors.
+        >>> g = SparseHyperMinesGame([2, 3], [[0, 0]])
+        >>> g.bombs, g.covered
+        ({0}, 5)
+        >>> SparseHyperMinesGame([3, 3], [[0, 0], [0, 0]]).flat_board
+        ['.', 2, 0, 2, 2, 0, 0, 0, 0]
+        """
+        self.dimensions = dims
+        self.strides = make_strides(dims)
+        self.state = 'ongoing'
+        self.size = 1
+        for d in dims:
+            self.size *= d
+        listed = {}
+        for b in bombs:
+            i = flat_index(b, self.strides)
+            listed[i] = listed.get(i, 0) + 1
+        self.bombs = set(listed)
+        self.counts = {}
+        # value counts each bomb once, so the counts around bombs listed more
+        # than once are worked out here instead.
+        for i, times in listed.items():
+            if times > 1:
+                for n in self.neighbors(i):
+                    if n not in self.bombs and n not in self.counts:
+                        self.counts[n] = sum(listed.get(m, 0) for m in self.neighbors(n))
+        self.revealed = {}
+        self.covered = self.size - len(self.bombs)
+        self.revealed_bombs = 0
+
+    def value(self, index):
+        """Return the value of the square at the given flat index: '.' for a
+        bomb, and otherwise the number of neighboring bombs (computed the
+        first time it is needed).
+        >>> g = SparseHyperMinesGame([2, 3], [[0, 0], [1, 1]])
+        >>> [g.value(i) for i in range(6)]
+        ['.', 2, 1, 2, '.', 1]
+        """
+        if index in self.bombs:
+            return '.'
+        if index in self.counts:
+            return self.counts[index]
+        count = sum(1 for n in self.neighbors(index) if n in self.bombs)
+        if count:
+            self.counts[index] = count
+        return count
+
+    @property
+    def flat_board(self):
+        """The whole board, as a flat list (built on each access).
+        >>> SparseHyperMinesGame([1, 3], [[0, 0]]).flat_board
+        ['.', 1, 0]
+        """
+        return [self.value(i) for i in range(self.size)]
+
+    @property
+    def flat_mask(self):
+        """The whole mask, as a flat bytearray (built on each access).
+        >>> g = SparseHyperMinesGame([1, 3], [[0, 0]])
+        >>> g.dig([0, 2])
+        2
+        >>> list(g.flat_mask)
+        [0, 1, 1]
+        """
+        return bytearray(1 if i in self.revealed else 0 for i in range(self.size))
+
+    def dig(self, coords):
+        """Dig up square at coords and neighboring squares, exactly as in
+        HyperMinesGame.dig.
+        >>> g = SparseHyperMinesGame([3, 3], [[0, 0]])
+        >>> g.dig([2, 2])
+        8
+        >>> g.state
+        'victory'
+        """
+        index = flat_index(coords, self.strides)
+        if self.state != 'ongoing' or index in self.revealed:
+            return 0
+
+        this_spot = self.revealed[index] = self.value(index)
+        if this_spot == '.':
+            self.revealed_bombs += 1
+            self.state = 'defeat'
+            self.record_reveals([index])
+            return 1
+
+        revealed = [index]
+        for i in revealed:
+            if self.revealed[i] == 0:
+                for n in self.neighbors(i):
+                    if n not in self.revealed:
+                        self.revealed[n] = self.value(n)
+                        revealed.append(n)
+
+        self.covered -= len(revealed)
+        self.state = 'victory' if self.victory() else 'ongoing'
+        self.record_reveals(revealed)
+        return len(revealed)
+
+    def revealed_indices(self):
+        """Return a list of the flat indices of the revealed squares (in the
+        order they were revealed).
+        >>> g = SparseHyperMinesGame([1, 3], [[0, 0]])
+        >>> g.dig([0, 1])
+        1
+        >>> g.revealed_indices()
+        [1]
+        """
+        return list(self.revealed)
+
+    def render(self, xray=False, region=None):
+        """Prepare (part of) the game for display, as in HyperMinesGame.render.
+        Only squares in the region are looked at, so this is cheap for a small
+        region of a huge space.
+        >>> g = SparseHyperMinesGame([2, 3], [[0, 0]])
+        >>> g.render(True)
+        [['.', '1', ' '], ['1', '1', ' ']]
+        """
+        if region is None:
+            region = [(0, d) for d in self.dimensions]
+        out = []
+        for i in region_indices(self.dimensions, region):
+            if xray or i in self.revealed:
+                v = self.value(i)
+                out.append(' ' if v == 0 else str(v))
+            else:
+                out.append('_')
+        return nd_from_flat(out, [stop - start for start, stop in region])
+
+    def count_squares(self):
+        """Set the covered and revealed_bombs counts from the stored bombs and
+        revealed squares.
+        >>> g = SparseHyperMinesGame([1, 3], [[0, 0]])
+        >>> g.revealed = {0: '.', 2: 0}
+        >>> g.count_squares()
+        >>> g.covered, g.revealed_bombs
+        (1, 1)
+        """
+        self.revealed_bombs = sum(1 for i in self.revealed if i in self.bombs)
+        self.covered = self.size - len(self.bombs) - (len(self.revealed) - self.revealed_bombs)
+
+    @classmethod
+    def from_flat(cls, dims, flat_board, flat_mask=None, state='ongoing', counts=None):
+        """Create a new instance of the class from a flat board and mask, as
+        in HyperMinesGame.from_flat (from_dict and from_bytes also work,
+        through this).
+        >>> g = SparseHyperMinesGame.from_flat([1, 3], ['.', 1, 0], [False, True, False])
+        >>> g.bombs, g.revealed, g.covered
+        ({0}, {1: 1}, 1)
+        """
         game = cls.__new__(cls)
-        for i in ('dimensions', 'board', 'state', 'mask'):
-            setattr(game, i, d[i])
+        game.dimensions = dims
+        game.strides = make_strides(dims)
+        game.state = state
+        game.size = len(flat_board)
+        game.bombs = {i for i, v in enumerate(flat_board) if v == '.'}
+        game.counts = {i: v for i, v in enumerate(flat_board) if v != '.' and v}
+        if flat_mask is None:
+            game.revealed = {}
+        else:
+            game.revealed = {i: flat_board[i] for i, m in enumerate(flat_mask) if m}
+        if counts is None:
+            game.count_squares()
+        else:
+            game.covered, game.revealed_bombs = counts
         return game
 
 
@@ -5,175 +5,485 @@ sys.setrecursionlimit(10000)
 # NO ADDITIONAL IMPORTS
 
 
-def set_peek(s):
+def encode_formula(formula):
     """
-    Helper function: return an arbitrary element that is in the given set
-    without modifying the set.
+    Returns the given CNF formula in the form the solvers work with: each
+    variable is numbered (from 1, in order of first appearance), and each
+    literal (var, val) becomes a signed int, n if val is True and -n if it is
+    False, where n is the variable's number.  The result is a tuple (names,
+    literals, starts): names[n] is the variable numbered n (names[0] is None),
+    the literals of every clause are in the flat list literals, and clause i
+    is literals[starts[i]:starts[i+1]].
+
+    >>> encode_formula([[('a', True), ('b', False)], [('b', True)]])
+    ([None, 'a', 'b'], [1, -2, 2], [0, 2, 3])
     """
-    for i in s:
-        return i
+    numbers = {}
+    names = [None]
+    literals = []
+    starts = [0]
+    for clause in formula:
+        for var, val in clause:
+            n = numbers.get(var)
+            if n is None:
+                n = numbers[var] = len(names)
+                names.append(var)
+            literals.append(n if val else -n)
+        starts.append(len(literals))
+    return names, literals, starts
+
+
+def decode_assignment(names, literals):
+    """
+    Returns the assignment (a dictionary mapping variables to booleans) that
+    makes the given int literals true, with variables named as in names (from
+    encode_formula).
+
+    >>> decode_assignment([None, 'a', 'b'], [1, -2])
+    {'a': True, 'b': False}
+    """
+    return {names[abs(lit)]: lit > 0 for lit in literals}
 
 
-def dict_peek(d):
+class FormulaIndex:
     """
-    Helper function: return an arbitrary (key, value) tuple from the given
-    dictionary without modifying the dictionary.
+    A formula with nvars variables, encoded as by encode_formula, indexed for
+    DPLL search.  Rather than copying the formula as variables are set, this
+    keeps
+
+      * self.occurs: for each literal (at index literal + nvars), the indices
+        of the clauses it occurs in,
+      * self.free and self.true: for each clause, how many of its literals
+        are not false, and how many are true,
+      * self.active: for each literal, how many clauses that are not yet
+        satisfied it occurs in (a literal is pure when its negation has none),
+      * self.units and self.pure: queues of the clauses that may have become
+        unit and the literals that may have become pure,
+      * self.trail: the literals made true so far, in order (so that setting
+        variables can be undone), with self.values holding 1, -1 or 0 (not
+        set) for each variable.
+
+    These are all updated as each variable is set (or unset), so nothing
+    needs to look through the whole formula.
     """
-    for x in d.items():
-        return x
 
-
-def unit_propagation(formula, assignment):
+    def __init__(self, nvars, literals, starts):
+        self.nvars = nvars
+        self.clauses = [list(dict.fromkeys(literals[starts[i]:starts[i+1]]))
+                        for i in range(len(starts) - 1)]
+        self.occurs = [[] for _ in range(2*nvars + 1)]
+        for index, clause in enumerate(self.clauses):
+            for lit in clause:
+                self.occurs[lit + nvars].append(index)
+        self.free = [len(clause) for clause in self.clauses]
+        self.true = [0] * len(self.clauses)
+        self.active = [len(occurs) for occurs in self.occurs]
+        self.values = [0] * (nvars + 1)
+        self.trail = []
+        self.unsatisfied = len(self.clauses)  # clauses with no true literal
+        self.false = self.free.count(0)  # clauses with every literal false
+        self.units = [i for i, clause in enumerate(self.clauses) if len(clause) == 1]
+        self.pure = [lit for lit in range(-nvars, nvars + 1)
+                     if lit and self.active[lit + nvars] and not self.active[nvars - lit]]
+        self.scan = 0  # clauses before this one are known to be satisfied
+
+    def assign(self, lit):
+        """
+        Make the given literal true.  Returns False if that makes a clause
+        false.
+        """
+        nvars, true, free, active = self.nvars, self.true, self.free, self.active
+        self.values[abs(lit)] = 1 if lit > 0 else -1
+        self.trail.append(lit)
+        for index in self.occurs[lit + nvars]:
+            true[index] += 1
+            if true[index] == 1:
+                # newly satisfied: its literals no longer count for purity.
+                self.unsatisfied -= 1
+                for other in self.clauses[index]:
+                    active[other + nvars] -= 1
+                    if not active[other + nvars]:
+                        self.pure.append(-other)
+        for index in self.occurs[nvars - lit]:
+            free[index] -= 1
+            if not true[index]:
+                if free[index] == 0:
+                    self.false += 1
+                elif free[index] == 1:
+                    self.units.append(index)
+        return not self.false
+
+    def undo(self, mark):
+        """
+        Unset the variables set since the trail had the given length (in the
+        reverse order), and empty the queues.
+        """
+        nvars, true, free, active = self.nvars, self.true, self.free, self.active
+        while len(self.trail) > mark:
+            lit = self.trail.pop()
+            self.values[abs(lit)] = 0
+            for index in self.occurs[nvars - lit]:
+                if not true[index] and not free[index]:
+                    self.false -= 1
+                free[index] += 1
+            for index in self.occurs[lit + nvars]:
+                true[index] -= 1
+                if not true[index]:
+                    self.unsatisfied += 1
+                    for other in self.clauses[index]:
+                        active[other + nvars] += 1
+        # the search only backtracks to points where both queues had been
+        # emptied.
+        self.units = []
+        self.pure = []
+        self.scan = 0
+
+    def pick_variable(self):
+        """
+        Returns an unset variable from the first clause that is not yet
+        satisfied.
+        """
+        while self.true[self.scan]:
+            self.scan += 1
+        for lit in self.clauses[self.scan]:
+            if not self.values[abs(lit)]:
+                return abs(lit)
+
+
+def unit_propagation(index):
     """
-    implement unit propagation: given a formula, look for a clause that
-    contains a single variable.  if we find one, add it to our assignments.
+    implement unit propagation: take the clauses that have become unit (a
+    single literal that is not false, and none that are true) from the queue
+    in the FormulaIndex, and make their remaining literals true.
 
-    returns a 3-tuple containing an indicator of success, our assignments, and
-    the updated formula.
+    returns False if this makes some clause false, and True otherwise.
     """
-    # unit propagation
-    while True:
-        for ix, clause in enumerate(formula):
-            if len(clause) == 1:
-                # here we have a single variable
-                # gross hack to look at one element without popping it
-                (var, val) = set_peek(clause)
-                break  # break the for, continuing the while.
-        else:
-            # if we get here normally, break the while loop (no more unit
-            # literals)
-            break
-
-        # we arrive here if we found a value.  propagate.
-        result = propagate(formula, var, val, assignment)
-
-        if result[0] is None:
-            # we're still going.
-            _, assignment, formula = result
-        else:
-            return result
-    return None, assignment, formula
-
-
-def pure_literal_propagation(formula, assignment):
+    values = index.values
+    while index.units and not index.false:
+        clause = index.units.pop()
+        if index.true[clause] or index.free[clause] != 1:
+            continue  # no longer unit
+        for lit in index.clauses[clause]:
+            if not values[abs(lit)]:
+                index.assign(lit)
+                break
+    return not index.false
+
+
+def pure_literal_propagation(index):
     """
-    implement pure literal propagation: given a formula, look for a variable
-    that only shows up in a single polarity across all clauses.  if we find
-    one, add it to our assignments.
-
-    returns a 3-tuple containing an indicator of success, our assignments, and
-    the updated formula.
+    implement pure literal propagation: take the literals that may have
+    become pure (appearing in some clause that is not yet satisfied, while
+    their negations appear in none) from the queue in the FormulaIndex, and
+    make those that are pure true.  this can't make any clause false.
     """
-    # pure literal propagation
-    # (things that can only be in one polarity)
-    while True:
-        consider = {j[0]: set() for i in formula for j in i}
-        for i in formula:
-            for j in i:
-                consider[j[0]].add(j[1])
-        consider = {k: v for k,v in consider.items() if len(v) == 1}
-        if not consider:
-            break
-
-        var, val = dict_peek(consider)
-        val = val.pop()
-
-        # we arrive here if we found a value.  propagate.
-        result = propagate(formula, var, val, assignment)
-
-        if result[0] is None:
-            # we're still going.
-            _, assignment, formula = result
-        else:
-            return result
-    return None, assignment, formula
-
-
-def propagate(formula, var, val, assignment):
+    nvars, values, active = index.nvars, index.values, index.active
+    while index.pure:
+        lit = index.pure.pop()
+        if not values[abs(lit)] and active[lit + nvars] and not active[nvars - lit]:
+            index.assign(lit)
+
+
+def sat_helper(index):
     """
-    helper function that simplifies a formula given a new variable and value to
-    set.
+    helper function that implements the core functionality for the SAT solver,
+    on a FormulaIndex.
 
-    returns a 3-tuple containing an indicator of success, our assignments, and
-    the updated formula.
+    returns True if the formula can be satisfied (with the satisfying
+    assignment left on index.trail), and False (with the index as it was)
+    otherwise.
     """
-    # make a copy of assignment to work with, and set the given variable to the
-    # given value in it.
-    assignment = dict(assignment)
-    assignment[var] = val
-    # update the formula based on this assignment.
-    # clauses containing (var, val) are satisfied already (so remove them from the formula).
-    # clauses containing (var, not val) must be satisfied by another variable,
-    # so remove (var, not val) from them but otherwise leave them intact.
-    new_form = [clause - {(var, not val)} for clause in formula if (var, val) not in clause]
-
-    # at this point, if any empty clauses exist, they cannot be satisfied.  and
-    # if no clauses remain, we have already satisfied the formula.
-    if not new_form:
-        # if the list is empty, we win
-        return True, assignment, []
-    if not all(new_form):
-        # if any clause is empty, we lose
-        return False, {}, []
-    # otherwise, we're still going
-    return None, assignment, new_form
-
-
-def sat_helper(formula, assignment):
+    mark = len(index.trail)
+    # do unit propagation and pure literal propagation, and continue on if
+    # they neither satisfied everything nor found that we can't satisfy.
+    if unit_propagation(index):
+        pure_literal_propagation(index)
+        if not index.unsatisfied:
+            return True
+
+        # neither of the above fully solved the problem.  so we'll pick a
+        # variable and try setting it, first to True and then to False.
+        var = index.pick_variable()
+        for lit in (var, -var):
+            here = len(index.trail)
+            if index.assign(lit) and sat_helper(index):
+                return True
+            index.undo(here)
+
+    index.undo(mark)
+    return False
+
+
+def satisfying_assignment_dpll(formula):
     """
-    helper function that implements the core functionality for the SAT solver.
+    Find a satisfying assignment for a given CNF formula, by recursive search
+    (DPLL).  Returns that assignment if one exists, or None otherwise.
+
+    >>> satisfying_assignment_dpll([])
+    {}
+    >>> satisfying_assignment_dpll([[('a', True), ('b', False)], [('a', True), ('b', True)]])
+    {'a': True}
+    >>> satisfying_assignment_dpll([[('a', True)], [('a', False)]])
+    """
+    names, literals, starts = encode_formula(formula)
+    index = FormulaIndex(len(names) - 1, literals, starts)
+    if sat_helper(index):
+        return decode_assignment(names, index.trail)
+    else:
+        return None
 
-    returns a 3-tuple containing an indicator of success, our assignments, and
-    the updated formula.
 
-    the indicator of success takes one of three values:
-       * True: everything has been satisfied
-       * False: the formula could not be satisfied
-       * None: still in progress.
+class CDCLSolver:
+    """
+    A conflict-driven clause learning SAT solver, for a formula with nvars
+    variables encoded as by encode_formula (int literals, in a flat list, with
+    clause i at literals[starts[i]:starts[i+1]]).  Clauses are kept in the
+    same form, in self.literals and self.starts, with learned clauses added
+    at the end.  Other information about variables and literals is kept in
+    lists indexed by variable number (or by literal + nvars).
+
+    Rather than copying the formula at each step, the solver keeps a trail of
+    the literals it has made true (in order), the decision level at which each
+    variable was set, and the clause (the reason) that forced each variable
+    that was not a decision.  Backtracking just undoes the end of the trail.
+
+    Unit propagation uses two watched literals per clause: the first two
+    literals of each clause are "watched" (listed in self.watches under those
+    literals), and a clause only needs to be looked at when one of its
+    watched literals becomes false.  Then, either another literal that is not
+    false takes its place, or the clause has become unit (or a conflict).
+
+    On a conflict, the solver learns a new clause (by resolving the
+    conflicting clause with the reasons for its literals, back to the first
+    unique implication point), and backjumps to the level at which that clause
+    becomes unit.
+
+    To keep the assignments it returns small, the solver only decides
+    variables from the first original clause that is not yet satisfied,
+    choosing the literal whose variable has been in the most recent conflicts
+    (and making it true), and stops as soon as every original clause is
+    satisfied.
     """
-    # do unit propagation and continue on.
-    res = unit_propagation(formula, assignment)
-    if res[0] is not None:
-        # if unit propagation caused everything to be satisfied (or found that
-        # we can't satisfy), return the result.
-        return res
-
-    # if we didn't return something, we need to continue on with our updated
-    # assignments and formula.
-    _, assignment, formula = res
-
-    # do pure literal propagation and continue on.
-    res = pure_literal_propagation(formula, assignment)
-    if res[0] is not None:
-        # if pure literal propagation caused everything to be satisfied (or
-        # found that we can't satisfy), return the result.
-        return res
-
-    # if we didn't return something, we need to continue on with the updated
-    # assignments and formula.
-    _, assignment, formula = res
-
-    # neither of the above fully solved the problem.  so we'll pick a variable
-    # and try setting it.
-    var, _ = set_peek(formula[0])  # grab a variable
-
-    # recurse with set to true
-    form_true = propagate(formula, var, True, assignment)
-    if form_true[0] is True:
-        return form_true
-    elif form_true[0] is None:
-        rec_result = sat_helper(form_true[2], form_true[1])
-        if rec_result[0] is True:
-            return rec_result
-
-    # if we get here, setting the variable to True did not work.  try False.
-    form_false = propagate(formula, var, False, assignment)
-    if form_false[0] is not None:
-        return form_false
-
-    # if we are here, those recursive calls suggested that the process is
-    # ongoing.  recurse.
-    return sat_helper(form_false[2], form_false[1])
+
+    def __init__(self, nvars, literals, starts):
+        self.nvars = nvars
+        self.literals = []
+        self.starts = [0]
+        self.watches = [[] for _ in range(2*nvars + 1)]
+        self.values = [0] * (nvars + 1)  # 1 for true, -1 for false, 0 unset
+        self.level = [0] * (nvars + 1)
+        self.reason = [None] * (nvars + 1)
+        self.activity = [0.0] * (nvars + 1)
+        self.trail = []
+        self.trail_lim = []  # where each decision level starts on the trail
+        self.qhead = 0  # how much of the trail has been propagated
+        self.bump = 1.0
+        self.scan = 0  # clauses before this one are known to be satisfied
+        self.ok = True
+        for i in range(len(starts) - 1):
+            clause = list(dict.fromkeys(literals[starts[i]:starts[i+1]]))
+            if not clause:
+                self.ok = False
+            elif len(clause) == 1:
+                if not self.enqueue(clause[0], None):
+                    self.ok = False
+            else:
+                self.add_clause(clause)
+        self.num_original = len(self.starts) - 1
+
+    def value(self, lit):
+        """
+        Returns 1 if the literal is true, -1 if it is false, and 0 if its
+        variable has not been set.
+        """
+        val = self.values[abs(lit)]
+        return val if lit > 0 else -val
+
+    def add_clause(self, clause):
+        """
+        Add a clause (a list of at least two literals, the first two of which
+        will be watched), and return its index.
+        """
+        index = len(self.starts) - 1
+        self.literals.extend(clause)
+        self.starts.append(len(self.literals))
+        self.watches[clause[0] + self.nvars].append(index)
+        self.watches[clause[1] + self.nvars].append(index)
+        return index
+
+    def enqueue(self, lit, reason):
+        """
+        Make the given literal true (at the current decision level), because
+        of the clause with the given index (None for decisions and the
+        formula's unit clauses).  Returns False if it was already false.
+        """
+        val = self.value(lit)
+        if val:
+            return val > 0
+        var = abs(lit)
+        self.values[var] = 1 if lit > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+        return True
+
+    def propagate(self):
+        """
+        Unit propagation of everything on the trail that has not been
+        propagated yet.  Returns the index of a clause that has become false
+        (a conflict), or None.
+        """
+        literals, starts, values, watches = self.literals, self.starts, self.values, self.watches
+        nvars = self.nvars
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watching = watches[false_lit + nvars]
+            kept = []
+            for i, index in enumerate(watching):
+                start = starts[index]
+                # make sure the false literal is the second watched one.
+                if literals[start] == false_lit:
+                    literals[start] = literals[start + 1]
+                    literals[start + 1] = false_lit
+                first = literals[start]
+                if values[abs(first)] == (1 if first > 0 else -1):
+                    kept.append(index)
+                    continue
+                # look for another literal to watch.
+                for k in range(start + 2, starts[index + 1]):
+                    lit = literals[k]
+                    if values[abs(lit)] != (-1 if lit > 0 else 1):
+                        literals[start + 1] = lit
+                        literals[k] = false_lit
+                        watches[lit + nvars].append(index)
+                        break
+                else:
+                    # every other literal is false: the clause is unit, or
+                    # false.
+                    kept.append(index)
+                    if not self.enqueue(first, index):
+                        kept.extend(watching[i+1:])
+                        watches[false_lit + nvars] = kept
+                        return index
+            watches[false_lit + nvars] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learned from the conflict in the clause with the
+        given index (with the literal it will make true first, and a literal
+        from the level to backjump to second), and the level to backjump to.
+        """
+        learned = [None]
+        seen = set()
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+        current = len(self.trail_lim)
+        while True:
+            # the reason for a literal has that literal first.
+            start = self.starts[clause] + (lit is not None)
+            for q in self.literals[start:self.starts[clause + 1]]:
+                var = abs(q)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump_activity(var)
+                    if self.level[var] == current:
+                        counter += 1
+                    else:
+                        learned.append(q)
+            # go back along the trail to the next literal involved.
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[abs(lit)]
+        learned[0] = -lit
+        if len(learned) == 1:
+            return learned, 0
+        # watch a literal from the highest level among the others.
+        top = max(range(1, len(learned)), key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[top] = learned[top], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump_activity(self, var):
+        self.activity[var] += self.bump
+        if self.activity[var] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.bump *= 1e-100
+
+    def backtrack(self, level):
+        """
+        Undo every assignment made after the given decision level.
+        """
+        if len(self.trail_lim) <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            self.values[abs(lit)] = 0
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+        self.scan = 0
+
+    def pick_literal(self):
+        """
+        Returns the literal to decide on next: the unset literal (of the
+        first original clause not yet satisfied) whose variable has the
+        highest activity.  Returns None if every original clause is
+        satisfied.
+        """
+        literals, starts, activity = self.literals, self.starts, self.activity
+        while self.scan < self.num_original:
+            clause = literals[starts[self.scan]:starts[self.scan + 1]]
+            if not any(self.value(lit) > 0 for lit in clause):
+                best = None
+                for lit in clause:
+                    if not self.value(lit) and (
+                            best is None or activity[abs(lit)] > activity[abs(best)]):
+                        best = lit
+                return best
+            self.scan += 1
+        return None
+
+    def solve(self):
+        """
+        Returns a list of literals whose truth satisfies the formula, or None
+        if the formula can't be satisfied.
+        """
+        if not self.ok:
+            return None
+        conflicts = 0
+        restart_at = 100
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_lim:
+                    return None  # a conflict without any decisions
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.enqueue(learned[0], self.add_clause(learned))
+                self.bump *= 1.05
+                conflicts += 1
+                if conflicts >= restart_at:
+                    # start the search again (keeping what was learned), so
+                    # that early bad decisions can be revisited.
+                    conflicts = 0
+                    restart_at = int(restart_at * 1.5)
+                    self.backtrack(0)
+                continue
+            lit = self.pick_literal()
+            if lit is None:
+                return list(self.trail)
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(lit, None)
 
 
 def satisfying_assignment(formula):
@@ -187,16 +497,9 @@ def satisfying_assignment(formula):
     {'a': True}
     >>> satisfying_assignment([[('a', True)], [('a', False)]])
     """
-    # convert the formula to a list of sets.
-    formula = [set(i) for i in formula]
-
-    # call the helper starting with the givne formula and an empty assignments
-    # dictionary.
-    result = sat_helper(formula, {})
-    if result[0]:
-        return result[1]  # result[1] will be the dictionary of assignments.
-    else:
-        return None
+    names, literals, starts = encode_formula(formula)
+    result = CDCLSolver(len(names) - 1, literals, starts).solve()
+    return None if result is None else decode_assignment(names, result)
 
 
 def make_neighbor_db(data):
@@ -255,7 +558,8 @@ def construct_solution(sol, vars_for_actors):
     out = {}
     def get_value(varlist):
         for i,v in enumerate(varlist):
-            if sol[v] == 1:
+            # variables the solver did not need to set are left out of sol.
+            if sol.get(v) == 1:
                 return i
         return None
 
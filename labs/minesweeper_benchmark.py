@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the 6.009 Lab 3 (Minesweeper) and Lab 4 (HyperMines) game
+operations.
+
+Lab 3 is measured both through its public functions (new_game, dig, is_victory
+and render, on games of nested lists) and through its flat_* functions (on flat
+games, as minesweeper_server uses), as "lab3" and "lab3-flat".  For each
+dimensionality (Lab 3 games are always 2-D) and approximate board size, this
+times starting a game, digging on an open board (one big flood
+fill) and on a dense board (many small digs), checking for victory, and
+rendering (the first render, a render after another dig, and an xray render),
+and measures the memory each game takes, using tracemalloc.  Timings are
+taken without tracemalloc running, since it slows Python down.
+
+    python3 minesweeper_benchmark.py --dims 2 3 4 5 6 --squares 4096 262144
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import lab3_solution as lab3
+import lab4_solution as lab4
+
+LABS = ('lab3', 'lab3-flat', 'lab4')
+
+
+def new_game(lab, dims, bombs):
+    """
+    Start a new game of the given lab (one of LABS).
+    """
+    if lab == 'lab3':
+        return lab3.new_game(dims[0], dims[1], bombs)
+    if lab == 'lab3-flat':
+        return lab3.new_flat_game(dims[0], dims[1], bombs)
+    return lab4.HyperMinesGame(dims, bombs)
+
+
+def dig(lab, game, coords):
+    """
+    Dig the square at the given coordinates of a game of the given lab.
+    """
+    if lab == 'lab3':
+        return lab3.dig(game, *coords)
+    return lab3.flat_dig(game, *coords) if lab == 'lab3-flat' else game.dig(coords)
+
+
+def victory(lab, game):
+    """
+    Returns True if the given game (of the given lab) has been won.
+    """
+    if lab == 'lab3':
+        return lab3.is_victory(game)
+    return lab3.flat_is_victory(game) if lab == 'lab3-flat' else game.victory()
+
+
+def render(lab, game, xray=False):
+    """
+    Render a game of the given lab.
+    """
+    if lab == 'lab3':
+        return lab3.render(game, xray)
+    return lab3.flat_render(game, xray) if lab == 'lab3-flat' else game.render(xray)
+
+
+def time_call(f, setup=None, repeat=1):
+    """
+    Call f(*setup()) (or f() if no setup is given) repeat times, running
+    setup untimed before each call.  Returns a tuple containing the best time
+    in seconds and the result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        result = f(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def memory_use(f, setup=None):
+    """
+    Call f(*setup()) (or f()) once, with tracemalloc running.  Returns a
+    tuple of the peak number of bytes allocated during the call, and the
+    number still allocated after it (such as the memory held by its result).
+    """
+    args = setup() if setup is not None else ()
+    tracemalloc.start()
+    try:
+        result = f(*args)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def layout(rng, dims, density):
+    """
+    Returns a random list of bomb coordinates covering about the given
+    fraction of a board with the given dimensions.
+    """
+    size = 1
+    for d in dims:
+        size *= d
+    return [lab4.flat_coords(i, dims) for i in rng.sample(range(size), int(size * density))]
+
+
+def open_square(game_board, dims):
+    """
+    Returns the coordinates of a square with no neighboring bombs (so that
+    digging it starts a flood fill), given the game's flat board.
+    """
+    for i, v in enumerate(game_board):
+        if v == 0:
+            return lab4.flat_coords(i, dims)
+    return None
+
+
+def flat_board(lab, game):
+    """
+    Returns the flat board of a game of the given lab.
+    """
+    if lab == 'lab3':
+        return [v for row in game['board'] for v in row]
+    return game['board'] if lab == 'lab3-flat' else game.flat_board
+
+
+def benchmark(lab, dims, open_density=0.01, dense_density=0.2, digs=200, seed=0, repeat=3):
+    """
+    Time the main game operations on boards with the given dimensions, and
+    measure their memory use.  Returns a dictionary of results.
+    """
+    rng = random.Random(seed)
+    size = 1
+    for d in dims:
+        size *= d
+    results = {'lab': lab, 'dimensions': dims, 'squares': size}
+    sparse = layout(rng, dims, open_density)
+    dense = layout(rng, dims, dense_density)
+
+    results['new_game_s'], game = time_call(lambda: new_game(lab, dims, dense), repeat=repeat)
+    results['new_game_peak_bytes'], results['game_bytes'] = memory_use(
+        lambda: new_game(lab, dims, dense))
+    results['bytes_per_square'] = results['game_bytes'] / size
+
+    # digging an open board: one flood fill from a square with no neighboring
+    # bombs.
+    start = open_square(flat_board(lab, new_game(lab, dims, sparse)), dims)
+    if start is not None:
+        def open_game():
+            return new_game(lab, dims, sparse), start
+        results['dig_open_s'], revealed = time_call(lambda g, c: dig(lab, g, c),
+                                                    setup=open_game, repeat=repeat)
+        results['dig_open_squares'] = revealed
+        results['dig_open_peak_bytes'], _ = memory_use(lambda g, c: dig(lab, g, c),
+                                                       setup=open_game)
+
+    # digging a dense board: many digs, each revealing few squares.
+    bombs = {tuple(b) for b in dense}
+    safe = [c for c in (lab4.flat_coords(i, dims) for i in rng.sample(range(size), min(size, 4 * digs)))
+            if c not in bombs][:digs]
+
+    def dense_digs(game):
+        for c in safe:
+            if victory(lab, game):
+                break
+            dig(lab, game, list(c))
+    results['dig_dense_s'], _ = time_call(dense_digs, setup=lambda: (new_game(lab, dims, dense), ),
+                                          repeat=repeat)
+    results['dig_dense_per_dig_s'] = results['dig_dense_s'] / max(1, len(safe))
+
+    def victories(game):
+        for _ in range(10000):
+            victory(lab, game)
+    results['victory_s'], _ = time_call(victories, setup=lambda: (game, ), repeat=repeat)
+    results['victory_per_call_s'] = results['victory_s'] / 10000
+
+    # rendering, on a board that has been partly dug.
+    def dug_game():
+        g = new_game(lab, dims, sparse)
+        if start is not None:
+            dig(lab, g, start)
+        return (g, )
+    results['render_s'], _ = time_call(lambda g: render(lab, g), setup=dug_game, repeat=repeat)
+    results['render_peak_bytes'], _ = memory_use(lambda g: render(lab, g), setup=dug_game)
+
+    def rerender(g):
+        render(lab, g)
+        dig(lab, g, safe[0] if safe else [0] * len(dims))
+        return (g, )
+    results['render_again_s'], _ = time_call(lambda g: render(lab, g),
+                                             setup=lambda: rerender(*dug_game()), repeat=repeat)
+    results['render_xray_s'], _ = time_call(lambda g: render(lab, g, True), setup=dug_game,
+                                            repeat=repeat)
+    return results
+
+
+def shape(ndims, squares):
+    """
+    Returns the dimensions of a cube with the given number of dimensions and
+    about the given number of squares.
+    """
+    return [max(2, round(squares ** (1 / ndims)))] * ndims
+
+
+def report(results):
+    """
+    Print a one-line summary of the results from benchmark.
+    """
+    def ms(key):
+        return '%9.3f' % (1000 * results[key]) if key in results else '%9s' % '-'
+    print('%-9s %-18s %9d %9s %9s %9s %9s %9s %9s %9s %8.1f %8.1f' % (
+        results['lab'], results['dimensions'], results['squares'],
+        ms('new_game_s'), ms('dig_open_s'), ms('dig_dense_per_dig_s'),
+        '%9.5f' % (1000 * results['victory_per_call_s']),
+        ms('render_s'), ms('render_again_s'), ms('render_xray_s'),
+        results['bytes_per_square'], results['render_peak_bytes'] / results['squares']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--labs', nargs='+', choices=LABS, default=list(LABS))
+    parser.add_argument('--dims', type=int, nargs='+', default=[2, 3, 4, 5, 6],
+                        help='numbers of dimensions to try (lab 3 is only run in 2-D)')
+    parser.add_argument('--squares', type=int, nargs='+', default=[4096, 65536],
+                        help='approximate board sizes to try')
+    parser.add_argument('--open-density', type=float, default=0.01)
+    parser.add_argument('--dense-density', type=float, default=0.2)
+    parser.add_argument('--digs', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON instead of a summary')
+    args = parser.parse_args(argv)
+
+    all_results = []
+    if not args.json:
+        print('times in ms (dense digs and victory per call); memory in bytes per square')
+        print('%-9s %-18s %9s %9s %9s %9s %9s %9s %9s %9s %8s %8s' % (
+            'lab', 'dimensions', 'squares', 'new_game', 'dig_open', 'dig_dense', 'victory',
+            'render', 'rerender', 'xray', 'game', 'render'))
+    for squares in args.squares:
+        for ndims in args.dims:
+            for lab in args.labs:
+                if lab != 'lab4' and ndims != 2:
+                    continue
+                results = benchmark(lab, shape(ndims, squares), args.open_density,
+                                    args.dense_density, args.digs, args.seed, args.repeat)
+                all_results.append(results)
+                if not args.json:
+                    report(results)
+    if args.json:
+        json.dump(all_results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+HTTP game server hosting many concurrent Minesweeper (Lab 3) and HyperMines
+(Lab 4) games.
+
+As with the tutorials' RPCServerHandler, requests are POST requests whose path
+names the function to call, with JSON arguments and a JSON response:
+
+    POST /new_game  {"lab": 4, "dimensions": [4, 4, 4], "bombs": [[0, 1, 2]]}
+    POST /dig       {"session": "3f2a...", "coords": [1, 1, 1]}
+    POST /render    {"session": "3f2a...", "xray": false, "delta": true}
+    POST /close     {"session": "3f2a..."}
+    POST /stats     {}
+
+new_game returns the new game's session ID, which the other functions take.
+Lab 3 games must be 2-dimensional, and only Lab 4 games can render deltas
+(the squares revealed since the last delta render).
+
+Requests from all sessions are handled on one asyncio event loop.  Recently
+used games are kept as game objects; when the games held in memory are
+estimated to use more than --memory-limit megabytes, the least recently used
+ones are packed into binary snapshots (see lab4_solution.encode_snapshot),
+and if that is not enough, snapshots are written to --directory and dropped
+from memory.  When the server stops, every game is written out, and snapshots
+already in the directory when it starts are picked up again, so games survive
+a restart.  /stats reports the latency of each kind of request, and where the
+games are held.
+
+    python3 minesweeper_server.py --directory games --memory-limit 512
+"""
+
+import os
+import json
+import time
+import signal
+import asyncio
+import secrets
+import argparse
+import traceback
+import collections
+
+import lab3_solution as lab3
+import lab4_solution as lab4
+
+
+# rough numbers of bytes each square takes in a game object: a lab 3 square is
+# a byte of board and a byte of mask, while a lab 4 square is a pointer into
+# the board list, a byte of mask, and a pointer into the rendered squares.
+BYTES_PER_SQUARE = {'lab3': 2, 'lab4': 17}
+
+# starts the record, kept in front of a lab 4 game's snapshot, of the squares
+# revealed since its last delta render.
+DELTA_MAGIC = b'MSD1'
+
+
+def new_game(kind, dimensions, bombs):
+    """
+    Start a new game of the given kind ('lab3' or 'lab4').
+    """
+    if kind == 'lab3':
+        return lab3.new_flat_game(dimensions[0], dimensions[1], bombs)
+    return lab4.HyperMinesGame(dimensions, bombs)
+
+
+def game_to_bytes(kind, game):
+    """
+    Returns a binary snapshot of the given game.  Once a lab 4 game has had a
+    delta render, the flat indices of the squares revealed since then (which
+    its snapshot leaves out) are kept in front of the snapshot, so that the
+    next delta render gives just those squares.
+    """
+    if kind == 'lab3':
+        return lab3.flat_to_bytes(game)
+    if game.delta is None:
+        return game.to_bytes()
+    return (DELTA_MAGIC + len(game.delta).to_bytes(8, 'big')
+            + b''.join(i.to_bytes(8, 'big') for i in game.delta) + game.to_bytes())
+
+
+def game_from_bytes(kind, data):
+    """
+    Returns the game stored in the given snapshot (made by game_to_bytes, or
+    by HyperMinesGame.to_bytes or lab3_solution.flat_to_bytes).
+    """
+    if kind == 'lab3':
+        return lab3.flat_from_bytes(data)
+    delta = None
+    if data[:4] == DELTA_MAGIC:
+        end = 12 + 8 * int.from_bytes(data[4:12], 'big')
+        delta = [int.from_bytes(data[i:i+8], 'big') for i in range(12, end, 8)]
+        data = data[end:]
+    game = lab4.HyperMinesGame.from_bytes(data)
+    if delta is not None:
+        game.delta = delta
+    return game
+
+
+def game_state(kind, game):
+    """
+    Returns the state ('ongoing', 'victory' or 'defeat') of the given game.
+    """
+    return game['state'] if kind == 'lab3' else game.state
+
+
+def game_size(kind, game):
+    """
+    Returns the number of squares in the given game.
+    """
+    return len(game['board']) if kind == 'lab3' else len(game.flat_mask)
+
+
+class QueryError(Exception):
+    """
+    A problem with a request, reported to the client with the given HTTP
+    status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class GameStore:
+    """
+    Holds the games of every session, in one of three places: as game objects
+    (self.live), as snapshots in memory (self.packed), or as snapshot files in
+    the given directory.  self.live and self.packed are kept in order of last
+    use, least recent first.  self.kinds maps every session ID to its kind of
+    game, wherever the game is held.
+    """
+    def __init__(self, directory, memory_limit):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.live = {}
+        self.packed = {}
+        self.kinds = {}
+        self.memory = 0  # estimated bytes held by self.live and self.packed
+        self.packs = self.spills = self.loads = 0
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            session, _, kind = name.partition('.')
+            if kind in BYTES_PER_SQUARE:
+                self.kinds[session] = kind
+
+    def filename(self, session):
+        return os.path.join(self.directory, '%s.%s' % (session, self.kinds[session]))
+
+    def footprint(self, session, game):
+        kind = self.kinds[session]
+        return BYTES_PER_SQUARE[kind] * game_size(kind, game)
+
+    def add(self, kind, game):
+        """
+        Start holding the given game, and return its new session ID.
+        """
+        session = secrets.token_hex(8)
+        self.kinds[session] = kind
+        self.live[session] = game
+        self.memory += self.footprint(session, game)
+        self.relieve()
+        return session
+
+    def get(self, session):
+        """
+        Return the game of the given session, bringing it back into memory if
+        it was packed or written out.
+        """
+        if session not in self.kinds:
+            raise QueryError(404, 'unknown session: %r' % (session, ))
+        if session in self.live:
+            game = self.live.pop(session)  # reinserted below, as most recent
+        else:
+            if session in self.packed:
+                data = self.packed.pop(session)
+                self.memory -= len(data)
+            else:
+                with open(self.filename(session), 'rb') as f:
+                    data = f.read()
+                os.remove(self.filename(session))
+                self.loads += 1
+            game = game_from_bytes(self.kinds[session], data)
+            self.memory += self.footprint(session, game)
+        self.live[session] = game
+        self.relieve()
+        return game
+
+    def remove(self, session):
+        """
+        Forget the game of the given session.
+        """
+        if session not in self.kinds:
+            raise QueryError(404, 'unknown session: %r' % (session, ))
+        if session in self.live:
+            self.memory -= self.footprint(session, self.live.pop(session))
+        elif session in self.packed:
+            self.memory -= len(self.packed.pop(session))
+        else:
+            os.remove(self.filename(session))
+        del self.kinds[session]
+
+    def write_all(self):
+        """
+        Write every game held in memory out to disk (so that they are picked
+        up again when the server next starts).
+        """
+        for session in list(self.live):
+            self.packed[session] = game_to_bytes(self.kinds[session], self.live.pop(session))
+        for session, data in self.packed.items():
+            with open(self.filename(session), 'wb') as f:
+                f.write(data)
+        self.packed.clear()
+        self.memory = 0
+
+    def relieve(self):
+        """
+        While more memory than the limit is used, pack the least recently used
+        game object into a snapshot, or (once only the most recently used game
+        is left as an object) write the least recently used snapshot out to
+        disk.
+        """
+        while self.memory > self.memory_limit:
+            if len(self.live) > 1:
+                session = next(iter(self.live))
+                game = self.live.pop(session)
+                data = self.packed[session] = game_to_bytes(self.kinds[session], game)
+                self.memory += len(data) - self.footprint(session, game)
+                self.packs += 1
+            elif self.packed:
+                session = next(iter(self.packed))
+                data = self.packed.pop(session)
+                with open(self.filename(session), 'wb') as f:
+                    f.write(data)
+                self.memory -= len(data)
+                self.spills += 1
+            else:
+                break
+
+    def summary(self):
+        return {'live': len(self.live), 'packed': len(self.packed),
+                'on_disk': len(self.kinds) - len(self.live) - len(self.packed),
+                'memory_estimate': self.memory, 'memory_limit': self.memory_limit,
+                'packs': self.packs, 'spills': self.spills, 'loads': self.loads}
+
+
+class LatencyStats:
+    """
+    Keeps the number and total time of the requests to each function, and the
+    times of the most recent ones (to report percentiles).
+    """
+    def __init__(self, recent=1000):
+        self.counts = collections.Counter()
+        self.totals = collections.Counter()
+        self.maxima = collections.Counter()
+        self.recent = collections.defaultdict(lambda: collections.deque(maxlen=recent))
+
+    def record(self, name, seconds):
+        self.counts[name] += 1
+        self.totals[name] += seconds
+        self.maxima[name] = max(self.maxima[name], seconds)
+        self.recent[name].append(seconds)
+
+    def summary(self):
+        """
+        Returns a dictionary mapping each function name to its request count,
+        and its mean, median, 99th percentile and largest latency (in
+        milliseconds; the percentiles are of recent requests only).
+        """
+        out = {}
+        for name, count in self.counts.items():
+            recent = sorted(self.recent[name])
+            out[name] = {'count': count,
+                         'mean_ms': 1000 * self.totals[name] / count,
+                         'p50_ms': 1000 * recent[len(recent) // 2],
+                         'p99_ms': 1000 * recent[min(len(recent) - 1, len(recent) * 99 // 100)],
+                         'max_ms': 1000 * self.maxima[name]}
+        return out
+
+
+class MinesweeperServer:
+    """
+    Answers requests about the games held in the given GameStore.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.stats = LatencyStats()
+        self.functions = {'new_game': self.new_game,
+                          'dig': self.dig,
+                          'render': self.render,
+                          'close': self.close,
+                          'stats': self.get_stats}
+
+    def session_id(self, args):
+        if 'session' not in args:
+            raise QueryError(400, 'missing argument: session')
+        session = args['session']
+        if not isinstance(session, str):
+            raise QueryError(400, 'bad session: %r' % (session, ))
+        return session
+
+    def session(self, args):
+        session = self.session_id(args)
+        return session, self.store.get(session)
+
+    def coords(self, args, key, dims):
+        loc = args.get(key)
+        if (not isinstance(loc, list) or len(loc) != len(dims)
+                or not all(isinstance(x, int) and 0 <= x < d for x, d in zip(loc, dims))):
+            raise QueryError(400, 'bad coordinates: %r' % (loc, ))
+        return loc
+
+    def new_game(self, args):
+        kind = {3: 'lab3', 4: 'lab4'}.get(args.get('lab', 4))
+        if kind is None:
+            raise QueryError(400, 'lab must be 3 or 4')
+        dims = args.get('dimensions')
+        if (not isinstance(dims, list) or not dims
+                or not all(isinstance(d, int) and d > 0 for d in dims)):
+            raise QueryError(400, 'bad dimensions: %r' % (dims, ))
+        if kind == 'lab3' and len(dims) != 2:
+            raise QueryError(400, 'lab 3 games must be 2-dimensional')
+        if not isinstance(args.get('bombs', []), list):
+            raise QueryError(400, 'bad bombs: %r' % (args['bombs'], ))
+        bombs = [self.coords({'bomb': b}, 'bomb', dims) for b in args.get('bombs', [])]
+        return {'session': self.store.add(kind, new_game(kind, dims, bombs))}
+
+    def dig(self, args):
+        session, game = self.session(args)
+        kind = self.store.kinds[session]
+        if kind == 'lab3':
+            row, col = self.coords(args, 'coords', game['dimensions'])
+            revealed = lab3.flat_dig(game, row, col)
+        else:
+            revealed = game.dig(self.coords(args, 'coords', game.dimensions))
+        return {'revealed': revealed, 'state': game_state(kind, game)}
+
+    def render(self, args):
+        session, game = self.session(args)
+        kind = self.store.kinds[session]
+        xray = bool(args.get('xray', False))
+        if args.get('delta'):
+            if kind == 'lab3':
+                raise QueryError(400, 'only lab 4 games can render deltas')
+            return {'delta': game.render_delta(), 'state': game.state}
+        if kind == 'lab3':
+            board = lab3.flat_render(game, xray)
+        else:
+            board = game.render(xray)
+        return {'board': board, 'state': game_state(kind, game)}
+
+    def close(self, args):
+        self.store.remove(self.session_id(args))
+        return {}
+
+    def get_stats(self, args):
+        return {'latency': self.stats.summary(), 'games': self.store.summary()}
+
+    def call(self, name, body):
+        if name not in self.functions:
+            raise QueryError(404, 'function not found: %s, while registered functions are: %s'
+                                  % (name, sorted(self.functions)))
+        try:
+            args = json.loads(body.decode()) if body else {}
+        except ValueError:
+            raise QueryError(400, "POST data doesn't look like json")
+        if not isinstance(args, dict):
+            raise QueryError(400, 'arguments must be a JSON object')
+        start = time.perf_counter()
+        try:
+            return self.functions[name](args)
+        finally:
+            self.stats.record(name, time.perf_counter() - start)
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests on one connection, until the client closes it (or
+        asks us to).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                name = target.lstrip('/').split('?')[0]
+                try:
+                    if method != 'POST':
+                        raise QueryError(405, 'only POST is supported')
+                    status, result = 200, self.call(name, body)
+                except QueryError as e:
+                    status, result = e.status, {'error': str(e)}
+                except Exception:
+                    traceback.print_exc()
+                    status, result = 500, {'error': 'internal error'}
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version != 'HTTP/1.0')
+                payload = json.dumps(result).encode()
+                writer.write(('HTTP/1.1 %d %s\r\n'
+                              'Content-Type: application/json; charset=UTF-8\r\n'
+                              'Content-Length: %d\r\n'
+                              'Connection: %s\r\n\r\n'
+                              % (status, 'OK' if status == 200 else 'Error', len(payload),
+                                 'keep-alive' if keep_alive else 'close')).encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away
+        finally:
+            writer.close()
+
+
+async def serve(host, port, store):
+    server = MinesweeperServer(store)
+    async with await asyncio.start_server(server.handle, host, port) as s:
+        print('serving on http://%s:%d' % (host, port), flush=True)
+        await s.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--directory', default='games',
+                        help='where to write the snapshots of evicted games')
+    parser.add_argument('--memory-limit', type=float, default=256,
+                        help='megabytes of games to hold in memory')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    store = GameStore(args.directory, int(args.memory_limit * 2**20))
+    # stop the same way on a kill as on Ctrl-C, so that the games are kept.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(serve(args.host, args.port, store))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.write_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo simulation of Minesweeper (Lab 3) and HyperMines (Lab 4) games,
+for tuning how many bombs make a board of a given size hard.
+
+Each game gets a random layout with the given number of bombs (or fraction of
+squares holding bombs), and is played until it is over, by one of the
+policies:
+
+  * random: dig a random hidden square, and
+  * solver: dig the squares minesweeper_solver can deduce to be safe, and a
+    random square that is not known to hold a bomb when it can't deduce any.
+
+The games are split into chunks, played across a pool of worker processes.
+Each chunk has its own random number generator, seeded from the --seed and
+the chunk's number, so a run gives the same results whatever the number of
+workers (or the order in which they get to the chunks).
+
+    python3 minesweeper_simulator.py --lab 4 --dims 8 8 8 --density 0.05 0.1 0.15 --games 20000
+"""
+
+import time
+import random
+import argparse
+import concurrent.futures
+
+import lab3_solution as lab3
+import lab4_solution as lab4
+import minesweeper_solver as solver
+
+POLICIES = ('random', 'solver')
+
+
+def random_layout(rng, size, nbombs, avoid=None):
+    """
+    Returns the flat indices of nbombs random squares, out of size, leaving
+    out the square at flat index avoid (if it is given).
+    """
+    if avoid is None:
+        return rng.sample(range(size), nbombs)
+    bombs = rng.sample(range(size - 1), nbombs)
+    return [b + (b >= avoid) for b in bombs]
+
+
+def play_lab3(rng, dims, nbombs, policy, safe_start):
+    """
+    Play one Lab 3 game, with a random layout, by the given policy.  Returns
+    a tuple (won, guesses), where guesses counts the squares dug without
+    knowing that they were safe.
+    """
+    nrows, ncols = dims
+    size = nrows * ncols
+    first = rng.randrange(size) if safe_start else None
+    game = lab3.new_flat_game(nrows, ncols, [divmod(b, ncols) for b in
+                                             random_layout(rng, size, nbombs, first)])
+    s = solver.Solver(dims) if policy == 'solver' else None
+    guesses = 0
+    while game['state'] == 'ongoing':
+        if s is not None and first is None:
+            # lab 3 games have no render_delta, so the solver reads the whole
+            # render each time.
+            s.read_render(lab3.flat_render(game))
+            s.deduce()
+            safe = [i for i, bomb in s.known.items() if not bomb]
+            if safe:
+                for i in safe:
+                    lab3.flat_dig(game, *divmod(i, ncols))
+                continue
+        if first is not None:
+            index, first = first, None
+        else:
+            index = random_hidden(rng, game['mask'], s)
+            guesses += 1
+        lab3.flat_dig(game, *divmod(index, ncols))
+    return game['state'] == 'victory', guesses
+
+
+def play_lab4(rng, dims, nbombs, policy, safe_start):
+    """
+    Play one Lab 4 game, with a random layout, by the given policy.  Returns
+    a tuple (won, guesses), as play_lab3 does.
+    """
+    size = 1
+    for d in dims:
+        size *= d
+    first = rng.randrange(size) if safe_start else None
+    game = lab4.HyperMinesGame(dims, [lab4.flat_coords(b, dims) for b in
+                                      random_layout(rng, size, nbombs, first)])
+    s = solver.Solver(dims) if policy == 'solver' else None
+    guesses = 0
+    while game.state == 'ongoing':
+        if first is not None:
+            index, first = first, None
+        else:
+            index = random_hidden(rng, game.flat_mask, s)
+            guesses += 1
+        game.dig(lab4.flat_coords(index, dims))
+        if s is not None:
+            solver.autoplay(game, s)
+    return game.state == 'victory', guesses
+
+
+def random_hidden(rng, mask, s=None):
+    """
+    Returns the flat index of a random hidden square (not known, by the
+    Solver s, to hold a bomb).
+    """
+    while True:
+        index = rng.randrange(len(mask))
+        if not mask[index] and (s is None or not s.known.get(index)):
+            return index
+
+
+def play_chunk(lab, dims, nbombs, policy, safe_start, games, seed, chunk):
+    """
+    Worker function: play the given number of games, with a random number
+    generator for this chunk.  Returns a tuple (wins, guesses).
+    """
+    rng = random.Random('%s/%s' % (seed, chunk))
+    play = play_lab3 if lab == 3 else play_lab4
+    wins = guesses = 0
+    for _ in range(games):
+        won, n = play(rng, dims, nbombs, policy, safe_start)
+        wins += won
+        guesses += n
+    return wins, guesses
+
+
+def simulate(executor, lab, dims, nbombs, policy='random', safe_start=False,
+             games=1000, seed=0, chunk_size=100):
+    """
+    Play the given number of games in the given executor.  Returns a
+    dictionary of the win rate, the mean number of guesses per game, and how
+    many games were played per second.
+    """
+    start = time.perf_counter()
+    chunks = [min(chunk_size, games - i) for i in range(0, games, chunk_size)]
+    futures = [executor.submit(play_chunk, lab, dims, nbombs, policy, safe_start, n, seed, i)
+               for i, n in enumerate(chunks)]
+    wins = guesses = 0
+    for f in futures:
+        w, g = f.result()
+        wins += w
+        guesses += g
+    elapsed = time.perf_counter() - start
+    return {'bombs': nbombs, 'games': games, 'win_rate': wins / games,
+            'mean_guesses': guesses / games, 'games_per_second': games / elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lab', type=int, choices=(3, 4), default=4)
+    parser.add_argument('--dims', type=int, nargs='+', default=[8, 8])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--bombs', type=int, nargs='+',
+                       help='numbers of bombs to try')
+    group.add_argument('--density', type=float, nargs='+', default=[0.15],
+                       help='fractions of the squares holding bombs to try')
+    parser.add_argument('--policy', choices=POLICIES, default='solver')
+    parser.add_argument('--safe-start', action='store_true',
+                        help='make the first square dug always safe')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.lab == 3 and len(args.dims) != 2:
+        parser.error('lab 3 games must be 2-dimensional')
+    size = 1
+    for d in args.dims:
+        size *= d
+    counts = args.bombs or [round(x * size) for x in args.density]
+    if any(not 0 <= n < size for n in counts):
+        parser.error('numbers of bombs must be between 0 and %d' % (size - 1, ))
+
+    print('lab %d, dimensions %s, %s policy%s, %d games each'
+          % (args.lab, args.dims, args.policy, ', safe start' if args.safe_start else '',
+             args.games))
+    print('%8s %8s %10s %10s %10s' % ('bombs', 'density', 'win rate', 'guesses', 'games/s'))
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        for n in counts:
+            r = simulate(executor, args.lab, args.dims, n, args.policy, args.safe_start,
+                         args.games, args.seed, args.chunk_size)
+            print('%8d %8.3f %10.4f %10.1f %10.1f'
+                  % (n, n / size, r['win_rate'], r['mean_guesses'], r['games_per_second']),
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""6.009 Labs 4 and 5 -- a HyperMines solver
+
+Deduces which hidden squares of a HyperMines game are safe and which hold
+bombs, from what a player can see (the rendered board).  Each revealed square
+with a count gives a constraint: exactly (count - known bombs) of its hidden
+neighbors that are not yet known are bombs.  These are used by
+
+  * the simple rules: if no bombs are left among a constraint's squares, they
+    are all safe, and if as many bombs are left as squares, they are all bombs,
+  * the subset rule, on pairs of constraints sharing squares: when one
+    constraint A needs as many more bombs than the other, B, as it has squares
+    that B does not, those squares are all bombs and B's other squares are all
+    safe (this covers the case where A's squares include all of B's), and
+  * for what is left, satisfiability (with Lab 5's satisfying_assignment) of
+    the constraints of each connected group of squares on the frontier.
+
+A Solver keeps what it has learned, and is given the squares revealed since
+it was last asked (from HyperMinesGame.render_delta), so it only reconsiders
+the constraints near those squares.  Playing a whole game then takes time
+roughly linear in its size, rather than going over the whole board after each
+move.
+"""
+
+import math
+import itertools
+
+import lab4_solution as lab4
+import lab5_solution as lab5
+
+
+class Solver:
+    """
+    What is known about the squares of a game with the given dimensions.
+    self.values maps the flat index of each revealed square to its value (a
+    count, or '.' for a bomb), and self.known maps the flat index of each
+    hidden square whose contents have been deduced to True (a bomb) or False
+    (safe).  self.dirty holds the revealed squares whose constraints have
+    changed since deduce last looked at them.
+
+    Groups of frontier squares larger than max_sat_squares, and constraints
+    that would need more than max_clauses clauses, are left out of the
+    satisfiability step (which is then weaker, but still right).
+    """
+    def __init__(self, dims, max_sat_squares=24, max_clauses=300):
+        self.dimensions = dims
+        self.strides = lab4.make_strides(dims)
+        self.max_sat_squares = max_sat_squares
+        self.max_clauses = max_clauses
+        self.values = {}
+        self.known = {}
+        self.dirty = set()
+
+    def neighbors(self, index):
+        """
+        Returns the flat indices of the neighbors of the given square (not
+        including the square itself).
+        >>> sorted(Solver([2, 3]).neighbors(2))
+        [1, 4, 5]
+        """
+        sig = lab4.edge_signature(index, self.dimensions)
+        return [index + step for step in lab4.neighbor_steps(self.dimensions, sig) if step]
+
+    def reveal(self, index, value):
+        """
+        Record that the given square has been revealed, with the given value
+        (a count, or '.').
+        """
+        if index in self.values:
+            return
+        self.values[index] = value
+        self.known.pop(index, None)
+        self.dirty.add(index)
+        for n in self.neighbors(index):
+            if n in self.values:
+                self.dirty.add(n)
+
+    def update(self, delta):
+        """
+        Record the squares revealed in the given list of (coordinates,
+        character) pairs, as returned by HyperMinesGame.render_delta.
+        >>> s = Solver([1, 3])
+        >>> s.update([((0, 1), '1'), ((0, 2), ' ')])
+        >>> s.values
+        {1: 1, 2: 0}
+        """
+        for coords, char in delta:
+            value = '.' if char == '.' else 0 if char == ' ' else int(char)
+            self.reveal(lab4.flat_index(coords, self.strides), value)
+
+    def read_render(self, rendered):
+        """
+        Record every revealed square of the given rendered board.
+        >>> s = Solver([2, 2])
+        >>> s.read_render([['1', '_'], ['_', '_']])
+        >>> s.values
+        {0: 1}
+        """
+        flat = lab4.nd_flatten(rendered, len(self.dimensions))
+        self.update((lab4.flat_coords(i, self.dimensions), char)
+                    for i, char in enumerate(flat) if char != '_')
+
+    def constraint(self, index):
+        """
+        Returns the constraint given by the revealed square at the given
+        index, as a tuple (squares, bombs): the hidden neighbors not yet known,
+        and how many of them are bombs.  Squares without a count give no
+        constraint, (set(), 0).
+        >>> s = Solver([1, 4])
+        >>> s.update([((0, 1), '2')])
+        >>> s.known[0] = True
+        >>> s.constraint(1)
+        ({2}, 1)
+        """
+        count = self.values[index]
+        if count == '.' or count == 0:
+            return set(), 0
+        squares = set()
+        for n in self.neighbors(index):
+            if n in self.values:
+                count -= self.values[n] == '.'
+            elif n in self.known:
+                count -= self.known[n]
+            else:
+                squares.add(n)
+        return squares, count
+
+    def mark(self, index, bomb, found):
+        """
+        Record the deduction that the given hidden square is (or is not) a
+        bomb, in self.known and in the dictionary found, and mark the
+        constraints involving it as changed.
+        """
+        self.known[index] = found[index] = bomb
+        for n in self.neighbors(index):
+            if n in self.values:
+                self.dirty.add(n)
+
+    def deduce(self):
+        """
+        Returns a dictionary mapping the flat index of each hidden square
+        newly deduced (since the last call) to True if it is a bomb and False
+        if it is safe.
+        >>> s = Solver([3, 3])
+        >>> s.read_render([['_', '1', ' '], ['1', '1', ' '], [' ', ' ', ' ']])
+        >>> s.deduce()
+        {0: True}
+        >>> s = Solver([1, 5])
+        >>> s.read_render([['_', '2', '_', '1', '_']])
+        >>> sorted(s.deduce().items())
+        [(0, True), (2, True), (4, False)]
+        """
+        found = {}
+        touched = set()
+        while True:
+            # the simple rules, until nothing changes.
+            while self.dirty:
+                index = self.dirty.pop()
+                touched.add(index)
+                squares, bombs = self.constraint(index)
+                if squares and (bombs == 0 or bombs == len(squares)):
+                    for x in squares:
+                        self.mark(x, bombs > 0, found)
+            touched = {i for i in touched if self.constraint(i)[0]}
+            if self.subset_rule(touched, found) or self.sat_rule(touched, found):
+                continue
+            return found
+
+    def sharing(self, squares):
+        """
+        Returns the revealed squares whose constraints involve any of the
+        given squares.
+        """
+        return {n for x in squares for n in self.neighbors(x) if n in self.values}
+
+    def subset_rule(self, indices, found):
+        """
+        Apply the subset rule (both ways round) to each of the constraints of
+        the given squares and the constraints sharing squares with it.
+        Returns True if anything was deduced.
+        """
+        progress = False
+        for a in indices:
+            for b in self.sharing(self.constraint(a)[0]):
+                if b == a:
+                    continue
+                # constraints change as deductions are made, so look them up
+                # again for each pair.
+                (squares_a, bombs_a), (squares_b, bombs_b) = self.constraint(a), self.constraint(b)
+                for (sq1, b1), (sq2, b2) in (((squares_a, bombs_a), (squares_b, bombs_b)),
+                                             ((squares_b, bombs_b), (squares_a, bombs_a))):
+                    only_1 = sq1 - sq2
+                    if only_1 and b1 - b2 == len(only_1):
+                        for x in only_1:
+                            self.mark(x, True, found)
+                        for x in sq2 - sq1:
+                            self.mark(x, False, found)
+                        progress = True
+                        break
+        return progress
+
+    def sat_rule(self, indices, found):
+        """
+        Split the constraints of the given squares into groups that share no
+        squares, and deduce what can be deduced in each group by checking
+        which values of its squares can satisfy all its constraints.  Returns
+        True if anything was deduced.
+        """
+        seen = set()
+        progress = False
+        for start in indices:
+            if start in seen:
+                continue
+            group, squares = self.group(start, seen)
+            if group is None:
+                continue
+            formula = []
+            for index in group:
+                formula.extend(self.clauses(*self.constraint(index)))
+            if not formula:
+                continue  # every constraint was too big to write out
+            model = lab5.satisfying_assignment(formula)
+            if model is None:
+                continue  # the render we were given is not consistent
+            for x in squares:
+                # x is forced to the value it has in the model if the formula
+                # can't be satisfied with the other value.
+                if x in model and lab5.satisfying_assignment(formula + [[(x, not model[x])]]) is None:
+                    self.mark(x, model[x], found)
+                    progress = True
+        return progress
+
+    def group(self, start, seen):
+        """
+        Returns the constraints (a list of revealed squares) connected, by
+        sharing squares, to the constraint of the given square, and the set of
+        squares they involve, adding the constraints to the set seen.  If the
+        group turns out to involve more than self.max_sat_squares squares,
+        returns (None, None) instead.
+        """
+        group = [start]
+        squares = set()
+        seen.add(start)
+        for index in group:
+            new = self.constraint(index)[0] - squares
+            squares |= new
+            if len(squares) > self.max_sat_squares:
+                return None, None
+            for n in self.sharing(new):
+                if n not in seen and self.constraint(n)[0]:
+                    seen.add(n)
+                    group.append(n)
+        return group, squares
+
+    def clauses(self, squares, bombs):
+        """
+        Returns CNF clauses (in Lab 5's format, with variables named by
+        squares and True meaning a bomb) saying that exactly the given number
+        of the given squares are bombs, or no clauses if that would take more
+        than self.max_clauses.  If the number of bombs is impossible (which
+        happens when the render is not consistent), returns an empty clause,
+        which can't be satisfied.
+        >>> sorted(sorted(c) for c in Solver([1]).clauses({1, 2}, 1))
+        [[(1, False), (2, False)], [(1, True), (2, True)]]
+        >>> Solver([1]).clauses({1}, 2)
+        [[]]
+        """
+        n = len(squares)
+        if not 0 <= bombs <= n:
+            return [[]]
+        if math.comb(n, bombs + 1) + math.comb(n, n - bombs + 1) > self.max_clauses:
+            return []
+        squares = sorted(squares)
+        # at most `bombs` bombs: some square is safe in every group of bombs+1
+        # squares, and at least `bombs`: some square is a bomb in every group of
+        # n-bombs+1.
+        return ([[(x, False) for x in c] for c in itertools.combinations(squares, bombs + 1)]
+                + [[(x, True) for x in c] for c in itertools.combinations(squares, n - bombs + 1)])
+
+
+def solve(rendered, dims):
+    """
+    Returns the (sorted) lists of the coordinates of the hidden squares of the
+    given rendered board that can be deduced to be safe, and of those that can
+    be deduced to hold bombs.
+    >>> solve([['_', '1', ' '], ['1', '1', ' '], [' ', ' ', ' ']], [3, 3])
+    ([], [(0, 0)])
+    >>> solve([['3', '_']], [1, 2])
+    ([], [])
+    """
+    s = Solver(dims)
+    s.read_render(rendered)
+    s.deduce()
+    safe = sorted(lab4.flat_coords(i, dims) for i, bomb in s.known.items() if not bomb)
+    bombs = sorted(lab4.flat_coords(i, dims) for i, bomb in s.known.items() if bomb)
+    return safe, bombs
+
+
+def autoplay(game, solver=None):
+    """
+    Dig every square of the given HyperMinesGame that can be deduced to be
+    safe, until the game is over or nothing more can be deduced.  Returns the
+    Solver (which can be given again, after other moves, to carry on).
+    >>> g = lab4.HyperMinesGame([1, 5], [[0, 0], [0, 2]])
+    >>> g.dig([0, 1]), g.dig([0, 3])
+    (1, 1)
+    >>> _ = autoplay(g)
+    >>> g.state
+    'victory'
+    """
+    if solver is None:
+        solver = Solver(game.dimensions)
+    solver.update(game.render_delta())
+    while game.state == 'ongoing':
+        safe = [i for i, bomb in solver.deduce().items() if not bomb]
+        if not safe:
+            break
+        for i in safe:
+            game.dig(lab4.flat_coords(i, game.dimensions))
+        solver.update(game.render_delta())
+    return solver
+
+
+if __name__ == '__main__':
+    import doctest
+    _doctest_flags = doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS
+    doctest.testmod(optionflags=_doctest_flags)